@@ -0,0 +1,29 @@
+"""add composite index to posts (created_at, id) for keyset pagination
+
+Revision ID: 3f9c2d7a1b64
+Revises: 7a5ce50b6347
+Create Date: 2026-10-18 10:12:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2d7a1b64'
+down_revision: Union[str, None] = '7a5ce50b6347'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_posts_created_at_id', 'posts', [sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+    # one author's posts (/posts/me), same order
+    op.create_index('ix_posts_user_id_created_at_id', 'posts', ['user_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_posts_user_id_created_at_id', table_name='posts')
+    op.drop_index('ix_posts_created_at_id', table_name='posts')
@@ -0,0 +1,32 @@
+"""add like_count to posts (denormalized likes counter)
+
+Revision ID: a61e0c94d2f8
+Revises: 3f9c2d7a1b64
+Create Date: 2026-10-18 11:02:17.540391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a61e0c94d2f8'
+down_revision: Union[str, None] = '3f9c2d7a1b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('like_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    # back-fill from existing likes
+    op.execute("""
+        UPDATE posts SET like_count = counts.real_count
+        FROM (SELECT post_id, COUNT(user_id) AS real_count FROM likes GROUP BY post_id) AS counts
+        WHERE posts.id = counts.post_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'like_count')
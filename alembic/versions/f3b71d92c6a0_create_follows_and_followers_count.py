@@ -0,0 +1,37 @@
+"""create follows relationship and users.followers_count
+
+Revision ID: f3b71d92c6a0
+Revises: e5a92c18f0d4
+Create Date: 2026-10-18 15:21:47.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b71d92c6a0'
+down_revision: Union[str, None] = 'e5a92c18f0d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('follows',
+    sa.Column('follower_id', sa.Integer(), nullable=False),
+    sa.Column('followed_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['follower_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['followed_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('follower_id', 'followed_id')
+    )
+    op.create_index('ix_follows_followed_id', 'follows', ['followed_id'], unique=False)
+    op.add_column('users', sa.Column('followers_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'followers_count')
+    op.drop_index('ix_follows_followed_id', table_name='follows')
+    op.drop_table('follows')
@@ -0,0 +1,86 @@
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from . import models
+from .config import AUTH_CACHE_MAX_SIZE, AUTH_CACHE_TTL_SECONDS
+from .token_store import token_hash
+
+# Authenticated Users Cache (in process)
+# [*] token hash -> (expire_at, user), LRU ordered, expire_at = min(token exp, now + ttl)
+# [*] user id -> token hashes, so updating/revoking a user drop all of its entries
+# [*] each worker has its own cache, the short ttl bound how long other workers may serve stale user
+
+
+_entries: "OrderedDict[str, tuple[float, models.User]]" = OrderedDict()
+_user_tokens: Dict[int, set[str]] = {}
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+
+def _detached_copy(user: models.User) -> models.User:
+    """
+    plain copy not bound to any session, safe to share between concurrent requests.
+    """
+    return models.User(**{column.name: getattr(user, column.name) for column in models.User.__table__.columns})
+
+
+def _drop(hashed: str) -> None:
+    _, user = _entries.pop(hashed)
+    hashes = _user_tokens.get(user.id)
+    if hashes is not None:
+        hashes.discard(hashed)
+        if not hashes:
+            del _user_tokens[user.id]
+
+
+def get(token: str) -> models.User | None:
+    if not AUTH_CACHE_MAX_SIZE:
+        return None
+
+    hashed = token_hash(token)
+    entry = _entries.get(hashed)
+    if entry is None:
+        _stats["misses"] += 1
+        return None
+
+    expire_at, user = entry
+    if expire_at <= time.time():
+        _drop(hashed)
+        _stats["expirations"] += 1
+        _stats["misses"] += 1
+        return None
+
+    _entries.move_to_end(hashed)
+    _stats["hits"] += 1
+    return user
+
+
+def put(token: str, user: models.User, token_exp: float) -> None:
+    if not AUTH_CACHE_MAX_SIZE:
+        return
+
+    hashed = token_hash(token)
+    if hashed in _entries:
+        _drop(hashed)
+
+    expire_at = min(token_exp, time.time() + AUTH_CACHE_TTL_SECONDS)
+    copy = _detached_copy(user)
+    _entries[hashed] = (expire_at, copy)
+    _user_tokens.setdefault(copy.id, set()).add(hashed)
+
+    while len(_entries) > AUTH_CACHE_MAX_SIZE:
+        _drop(next(iter(_entries))) # least recently used
+        _stats["evictions"] += 1
+
+
+def invalidate_user(user_id: int) -> None:
+    """
+    hook, call it when user data changed or its tokens revoked.
+    """
+    for hashed in list(_user_tokens.get(user_id, ())):
+        _drop(hashed)
+        _stats["invalidations"] += 1
+
+
+def cache_stats() -> Dict[str, int]:
+    return {**_stats, "size": len(_entries), "max_size": AUTH_CACHE_MAX_SIZE}
@@ -1,6 +1,8 @@
 from pathlib import Path
+from typing import Literal
 from fastapi.security import OAuth2PasswordBearer
 from pydantic_settings import BaseSettings
+import os
 from os import path
 
 
@@ -15,9 +17,82 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int
     refresh_token_expire_days: int
     
+    db_pool_size: int = 5 # connections kept open per worker
+    db_max_overflow: int = 10 # extra connections under burst, closed when returned
+    db_pool_timeout: float = 30 # seconds waiting for free connection before error
+    db_pool_recycle: int = 1800 # seconds, replace older connections (server / proxy idle timeouts)
+    db_pool_pre_ping: bool = False # ping on every checkout (extra round-trip), enable only if something drop idle connections before pool_recycle
+    db_pgbouncer_mode: bool = False # behind pgbouncer (transaction pooling): no app pool, no prepared statements
+    database_replica_hosts: str = '' # comma separated host:port of read replicas (same db / credentials), empty -> primary only
+    database_replica_health_interval_seconds: int = 10
+    sql_statements_header: bool = False # add X-SQL-Statements (count per request) to responses, for debugging / CI
+
     redis_hostname: str
     redis_password: str
     redis_port: int
+    redis_max_connections: int = 50 # per worker, shared by all requests
+    redis_socket_timeout: float = 5.0 # seconds
+    redis_socket_connect_timeout: float = 5.0 # seconds
+    redis_health_check_interval: int = 30 # seconds, ping idle connections before reuse
+
+    password_hash_executor: str = 'thread' # 'thread' or 'process'
+    password_hash_workers: int = 0 # 0 -> number of cpu cores
+    password_hash_max_queue: int = 100 # waiting hash jobs before reject with 503
+
+    login_window_seconds: int = 900 # sliding window of failed logins
+    login_free_attempts: int = 3 # failures allowed before slowing down the client
+    login_max_delay_seconds: float = 8.0
+    login_max_failures_per_client: int = 10 # same account from same ip, then reject with 429 until window slide
+    login_max_failures_per_ip: int = 50
+    login_max_failures_per_account: int = 100 # all ips together, high: distributed guessing only
+
+    auth_cache_max_size: int = 10000 # cached tokens per worker, 0 -> disabled
+    auth_cache_ttl_seconds: int = 30 # bound staleness across workers (invalidation is per process)
+
+    posts_count_strategy: Literal['exact', 'estimated', 'cached', 'none'] = 'exact' # CountStrategy values, bad value rejected at startup
+    posts_count_cache_ttl_seconds: int = 30
+
+    response_cache_ttl_seconds: int = 5 # cached post listing pages, 0 -> disabled
+    response_cache_stale_seconds: int = 30 # stale page served while one request rebuild it
+    response_cache_lock_seconds: int = 5 # max time to rebuild a page
+
+    export_batch_size: int = 1000 # rows fetched per round-trip while streaming exports
+    users_max_per_page: int = 100
+
+    posts_import_chunk_size: int = 5000 # rows per COPY (and transaction)
+    posts_import_max_errors: int = 1000 # row errors returned, rest only counted
+    posts_import_max_record_length: int = 1024 * 1024 # characters of one NDJSON line / CSV record
+
+    feed_max_length: int = 800 # post ids kept per user feed
+    feed_fanout_max_followers: int = 10000 # accounts with more followers not pushed, pulled on read
+    feed_fanout_batch_size: int = 1000 # followers per redis pipeline
+    feed_backfill_size: int = 100 # recent posts added to feed on follow
+
+    like_count_check_interval_seconds: int = 3600 # 0 -> periodic check disabled
+    like_count_auto_fix: bool = False # fix drift found by periodic check, else only report
+    likes_bulk_max_posts: int = 500 # post ids per /likes/bulk call
+    likes_write_behind: bool = False # buffer likes in redis, flushed to postgres in batches
+    likes_flush_interval_seconds: float = 1.0
+    likes_flush_batch_size: int = 5000 # buffered likes written per statement
+    likes_flush_lock_seconds: int = 60 # max time of one flush run
+
+    upload_chunk_size: int = 1024 * 1024 # bytes, memory used per upload
+    upload_max_size: int = 2 * 1024 * 1024 * 1024 # bytes, 0 -> unlimited
+    multipart_upload_ttl_seconds: int = 24 * 3600 # abandoned upload sessions removed after it
+    multipart_max_parts: int = 10000
+    multipart_cleanup_interval_seconds: int = 3600 # 0 -> cleanup task disabled
+    blob_sweep_interval_seconds: int = 3600 # unreferenced blobs left by failed deletes, 0 -> sweep task disabled
+    file_cache_control: str = 'private, max-age=86400' # default for files uploaded without own policy
+
+    storage_backend: str = 'local' # 'local' (OBJECTS_DIR) or 's3' (any S3-compatible: AWS, MinIO ...)
+    s3_bucket: str = ''
+    s3_endpoint_url: str | None = None # e.g. http://localhost:9000 for MinIO
+    s3_region: str | None = None
+    s3_access_key_id: str | None = None
+    s3_secret_access_key: str | None = None
+    s3_presign_expire_seconds: int = 3600
+    s3_multipart_chunk_size: int = 8 * 1024 * 1024 # bytes per part
+    s3_max_concurrency: int = 8 # parts transferred in parallel
 
     class Config:
         env_file = 'fastapi_app\.env'
@@ -25,6 +100,17 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
+# DATABASE POOL
+DB_POOL_SIZE = settings.db_pool_size
+DB_MAX_OVERFLOW = settings.db_max_overflow
+DB_POOL_TIMEOUT = settings.db_pool_timeout
+DB_POOL_RECYCLE = settings.db_pool_recycle
+DB_POOL_PRE_PING = settings.db_pool_pre_ping
+DB_PGBOUNCER_MODE = settings.db_pgbouncer_mode
+DATABASE_REPLICA_HOSTS = [host.strip() for host in settings.database_replica_hosts.split(',') if host.strip()]
+DATABASE_REPLICA_HEALTH_INTERVAL_SECONDS = settings.database_replica_health_interval_seconds
+SQL_STATEMENTS_HEADER = settings.sql_statements_header
+
 # JWT
 SECRET_KEY = settings.secret_key
 ALGORITHM = settings.algorithm
@@ -35,12 +121,92 @@ REFRESH_TOKEN_EXPIRE_DAYS = settings.refresh_token_expire_days
 REDIS_HOSTNAME = settings.redis_hostname
 REDIS_PASSWORD = settings.redis_password
 REDIS_PORT = settings.redis_port
+REDIS_MAX_CONNECTIONS = settings.redis_max_connections
+REDIS_SOCKET_TIMEOUT = settings.redis_socket_timeout
+REDIS_SOCKET_CONNECT_TIMEOUT = settings.redis_socket_connect_timeout
+REDIS_HEALTH_CHECK_INTERVAL = settings.redis_health_check_interval
+
+# PASSWORD HASHING POOL
+PASSWORD_HASH_EXECUTOR = settings.password_hash_executor
+PASSWORD_HASH_WORKERS = settings.password_hash_workers or os.cpu_count() or 1
+PASSWORD_HASH_MAX_QUEUE = settings.password_hash_max_queue
+
+# LOGIN THROTTLE
+LOGIN_WINDOW_SECONDS = settings.login_window_seconds
+LOGIN_FREE_ATTEMPTS = settings.login_free_attempts
+LOGIN_MAX_DELAY_SECONDS = settings.login_max_delay_seconds
+LOGIN_MAX_FAILURES_PER_CLIENT = settings.login_max_failures_per_client
+LOGIN_MAX_FAILURES_PER_IP = settings.login_max_failures_per_ip
+LOGIN_MAX_FAILURES_PER_ACCOUNT = settings.login_max_failures_per_account
+
+# AUTH CACHE
+AUTH_CACHE_MAX_SIZE = settings.auth_cache_max_size
+AUTH_CACHE_TTL_SECONDS = settings.auth_cache_ttl_seconds
+
+# PAGINATION
+POSTS_COUNT_STRATEGY = settings.posts_count_strategy
+POSTS_COUNT_CACHE_TTL_SECONDS = settings.posts_count_cache_ttl_seconds
+
+# RESPONSE CACHE
+RESPONSE_CACHE_TTL_SECONDS = settings.response_cache_ttl_seconds
+RESPONSE_CACHE_STALE_SECONDS = settings.response_cache_stale_seconds
+RESPONSE_CACHE_LOCK_SECONDS = settings.response_cache_lock_seconds
+
+# EXPORT
+EXPORT_BATCH_SIZE = settings.export_batch_size
+USERS_MAX_PER_PAGE = settings.users_max_per_page
+
+# POSTS IMPORT
+POSTS_IMPORT_CHUNK_SIZE = settings.posts_import_chunk_size
+POSTS_IMPORT_MAX_ERRORS = settings.posts_import_max_errors
+POSTS_IMPORT_MAX_RECORD_LENGTH = settings.posts_import_max_record_length
+
+# HOME FEED
+FEED_MAX_LENGTH = settings.feed_max_length
+FEED_FANOUT_MAX_FOLLOWERS = settings.feed_fanout_max_followers
+FEED_FANOUT_BATCH_SIZE = settings.feed_fanout_batch_size
+FEED_BACKFILL_SIZE = settings.feed_backfill_size
+
+# LIKE COUNTER
+LIKE_COUNT_CHECK_INTERVAL_SECONDS = settings.like_count_check_interval_seconds
+LIKE_COUNT_AUTO_FIX = settings.like_count_auto_fix
+LIKES_BULK_MAX_POSTS = settings.likes_bulk_max_posts
+LIKES_WRITE_BEHIND = settings.likes_write_behind
+LIKES_FLUSH_INTERVAL_SECONDS = settings.likes_flush_interval_seconds
+LIKES_FLUSH_BATCH_SIZE = settings.likes_flush_batch_size
+LIKES_FLUSH_LOCK_SECONDS = settings.likes_flush_lock_seconds
+
+# UPLOADS
+UPLOAD_CHUNK_SIZE = settings.upload_chunk_size
+UPLOAD_MAX_SIZE = settings.upload_max_size
+MULTIPART_UPLOAD_TTL_SECONDS = settings.multipart_upload_ttl_seconds
+MULTIPART_MAX_PARTS = settings.multipart_max_parts
+MULTIPART_CLEANUP_INTERVAL_SECONDS = settings.multipart_cleanup_interval_seconds
+BLOB_SWEEP_INTERVAL_SECONDS = settings.blob_sweep_interval_seconds
+FILE_CACHE_CONTROL = settings.file_cache_control
+
+# STORAGE BACKEND
+STORAGE_BACKEND = settings.storage_backend
+S3_BUCKET = settings.s3_bucket
+S3_ENDPOINT_URL = settings.s3_endpoint_url
+S3_REGION = settings.s3_region
+S3_ACCESS_KEY_ID = settings.s3_access_key_id
+S3_SECRET_ACCESS_KEY = settings.s3_secret_access_key
+S3_PRESIGN_EXPIRE_SECONDS = settings.s3_presign_expire_seconds
+S3_MULTIPART_CHUNK_SIZE = settings.s3_multipart_chunk_size
+S3_MAX_CONCURRENCY = settings.s3_max_concurrency
 
 # DIR MANAGMENT
 #! New: Create Upload Automatically Even if Deleted
 BASE_DIR = Path(__file__).resolve().parent
 UPLOAD_DIR = BASE_DIR / 'uploads'
 UPLOAD_DIR.mkdir(exist_ok=True) 
+MULTIPART_DIR = UPLOAD_DIR / '.multipart' # parts of in-progress resumable uploads
+MULTIPART_DIR.mkdir(exist_ok=True)
+OBJECTS_DIR = UPLOAD_DIR / 'objects' # content-addressed files: objects/ab/cd/abcd...(sha256)
+OBJECTS_DIR.mkdir(exist_ok=True)
+STAGING_DIR = UPLOAD_DIR / '.staging' # files being hashed before moved into objects
+STAGING_DIR.mkdir(exist_ok=True)
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token/")
\ No newline at end of file
@@ -0,0 +1,173 @@
+import os
+import uuid
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import AsyncIterator
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from .storage_backends import LocalStorage
+
+# Conditional & Range Downloads
+# [*] ETag = sha256 of content (strong, content under a file id never change), so If-None-Match hit -> 304 without touching disk.
+# [*] If-Modified-Since checked only when no If-None-Match (RFC 9110).
+# [*] Range: single range -> 206, many ranges -> 206 multipart/byteranges, unsatisfiable -> 416.
+# [*] If-Range with old validator -> ignore Range, send whole file.
+
+MAX_RANGES = 16 # more ranges than this served as whole file (protect from many tiny ranges)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == '*':
+        return True
+    # weak comparison for If-None-Match
+    return etag in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+
+def _parse_http_date(value: str) -> datetime | None:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    if (if_none_match := request.headers.get('if-none-match')) is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if (if_modified_since := request.headers.get('if-modified-since')) is not None:
+        since = _parse_http_date(if_modified_since)
+        return since is not None and int(last_modified.timestamp()) <= int(since.timestamp())
+
+    return False
+
+
+def _if_range_allows(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_range = request.headers.get('if-range')
+    if if_range is None:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range.strip() == etag # strong comparison required
+    since = _parse_http_date(if_range)
+    return since is not None and int(last_modified.timestamp()) == int(since.timestamp())
+
+
+def parse_range(header: str, size: int) -> list[tuple[int, int]] | None:
+    """
+    return inclusive (start, end) ranges, None when header should be ignored (serve whole file).
+    raise 416 when no range can be satisfied.
+    """
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes':
+        return None
+
+    ranges = []
+    for spec in specs.split(','):
+        spec = spec.strip()
+        if not spec:
+            continue
+        start_text, sep, end_text = spec.partition('-')
+        if not sep:
+            return None
+
+        if not start_text: # suffix range: last N bytes
+            if not end_text.isdigit():
+                return None
+            length = int(end_text)
+            if length == 0 or size == 0: # nothing to serve from an empty file
+                continue
+            ranges.append((max(0, size - length), size - 1))
+            continue
+
+        if not start_text.isdigit() or (end_text and not end_text.isdigit()):
+            return None
+        start = int(start_text)
+        if end_text and int(end_text) < start: # malformed (e.g. 5-2), whole header ignored
+            return None
+        if start >= size: # past EOF (e.g. resume of already complete file), not satisfiable
+            continue
+        end = int(end_text) if end_text else size - 1
+        ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+
+async def _read_multiple_ranges(storage: LocalStorage, key: str, parts: list[tuple[bytes, int, int]], closing: bytes) -> AsyncIterator[bytes]:
+    for part_header, start, end in parts:
+        yield part_header
+        async for chunk in storage.get_stream(key, start, end):
+            yield chunk
+        yield b'\r\n'
+    yield closing
+
+
+async def file_response(
+    request: Request,
+    storage: LocalStorage,
+    key: str,
+    filename: str,
+    etag: str,
+    last_modified: datetime,
+    cache_control: str,
+    media_type: str = 'application/octet-stream',
+) -> Response:
+    """
+    serve object key of local storage.
+    etag: quoted strong validator, e.g. '"<sha256>"'.
+    """
+    path = storage.path(key)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified.astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+
+    # client copy still valid, no body and no disk access
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    try:
+        size = (await run_in_threadpool(os.stat, path)).st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found on disk")
+
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+
+    range_header = request.headers.get('range')
+    ranges = None
+    if range_header and _if_range_allows(request, etag, last_modified):
+        try:
+            ranges = parse_range(range_header, size)
+        except HTTPException as e:
+            e.headers = {**headers, **e.headers}
+            raise
+
+    if not ranges:
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(storage.get_stream(key, start, end), status_code=status.HTTP_206_PARTIAL_CONTENT, media_type=media_type, headers=headers)
+
+    boundary = uuid.uuid4().hex
+    parts = [
+        (f"--{boundary}\r\nContent-Type: {media_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n".encode(), start, end)
+        for start, end in ranges
+    ]
+    closing = f"--{boundary}--\r\n".encode()
+    headers["Content-Length"] = str(sum(len(part_header) + (end - start + 1) + 2 for part_header, start, end in parts) + len(closing))
+    return StreamingResponse(
+        _read_multiple_ranges(storage, key, parts, closing),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers=headers,
+    )
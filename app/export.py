@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+
+from .config import EXPORT_BATCH_SIZE
+from .database import read_session
+
+# Streaming Export (NDJSON / CSV)
+# [*] server side cursor (yield_per), rows fetched EXPORT_BATCH_SIZE at a time, memory constant whatever table size.
+# [*] each batch serialized and sent before next one fetched, client start receiving immediately.
+# [*] session opened inside the stream (dependency session closed before streaming start), on read replica.
+
+
+class ExportFormat(str, Enum):
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
+MEDIA_TYPES = {ExportFormat.ndjson: 'application/x-ndjson', ExportFormat.csv: 'text/csv'}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} not serializable")
+
+
+async def _stream(stmt: Select, format: ExportFormat) -> AsyncIterator[str]:
+    names = list(stmt.selected_columns.keys())
+    if format == ExportFormat.csv:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        yield buffer.getvalue()
+
+    async with read_session() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for batch in result.partitions():
+            if format == ExportFormat.csv:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(batch)
+                yield buffer.getvalue()
+            else:
+                yield ''.join(json.dumps(dict(zip(names, row)), default=_json_default) + '\n' for row in batch)
+
+
+def export_response(stmt: Select, format: ExportFormat, filename: str) -> StreamingResponse:
+    """
+    stmt: select of plain columns (not ORM objects), exported in its order.
+    """
+    return StreamingResponse(
+        _stream(stmt, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}.{format.value}"},
+    )
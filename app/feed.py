@@ -0,0 +1,170 @@
+import base64
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List
+from fastapi import HTTPException, status
+from redis.asyncio import Redis
+from sqlalchemy import Row, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .config import FEED_MAX_LENGTH, FEED_FANOUT_MAX_FOLLOWERS, FEED_FANOUT_BATCH_SIZE, FEED_BACKFILL_SIZE
+from .database import SessionLocal
+from .pagination import NEWEST_FIRST, WITH_AUTHOR
+from .token_store import get_redis
+
+# Home Feed (fan-out-on-write)
+# [*] feed:{user_id} sorted set, member = post id, score = post created_at timestamp, trimmed to FEED_MAX_LENGTH newest.
+# [*] create post push its id into feed of every follower (and author), in background after response sent.
+# [*] accounts with >= FEED_FANOUT_MAX_FOLLOWERS followers not pushed (write amplification), their posts pulled on read.
+# [*] read = ids from feed + ids pulled from postgres, merged by time, then hydrated in one query.
+# [*] feed window exhausted (trimmed or redis lost) -> pull from all followed accounts, never empty holes.
+# [*] deleted posts stay in feeds until trimmed, hydration just skip them.
+# [*] cursor = last seen (score, post id), posts created in the same instant never skipped or repeated between pages.
+
+logger = logging.getLogger(__name__)
+
+
+def _feed_key(user_id: int) -> str:
+    return f"feed:{user_id}"
+
+
+def _score(created_at: datetime) -> float:
+    return created_at.timestamp()
+
+
+def encode_cursor(score: float, post_id: int) -> str:
+    raw = json.dumps({"s": score, "i": post_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(raw["s"]), int(raw["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
+
+
+def _push(pipeline, user_id: int, entries: Dict[int, float]) -> None:
+    pipeline.zadd(_feed_key(user_id), entries)
+    pipeline.zremrangebyrank(_feed_key(user_id), 0, -(FEED_MAX_LENGTH + 1)) # keep newest only
+
+
+def is_high_follower(user: models.User) -> bool:
+    return user.followers_count >= FEED_FANOUT_MAX_FOLLOWERS
+
+
+async def fan_out(author_id: int, post_id: int, created_at: datetime) -> None:
+    """
+    background task after create post, own session since request session already closed.
+    """
+    redis_cli = get_redis()
+    entries = {post_id: _score(created_at)}
+    try:
+        async with SessionLocal() as db:
+            author = await db.get(models.User, author_id)
+            if author is None:
+                return
+
+            async with redis_cli.pipeline(transaction=False) as pipeline:
+                _push(pipeline, author_id, entries)
+                await pipeline.execute()
+
+            if is_high_follower(author):
+                return # pulled by followers on read
+
+            # server side cursor, followers never all in memory
+            followers = await db.stream_scalars(
+                select(models.Follow.follower_id) \
+                .where(models.Follow.followed_id == author_id) \
+                .execution_options(yield_per=FEED_FANOUT_BATCH_SIZE)
+            )
+            async for batch in followers.partitions():
+                async with redis_cli.pipeline(transaction=False) as pipeline:
+                    for follower_id in batch:
+                        _push(pipeline, follower_id, entries)
+                    await pipeline.execute()
+    except Exception:
+        logger.exception("fan-out of post %s failed", post_id)
+
+
+async def on_follow(db: AsyncSession, redis_cli: Redis, follower_id: int, followed: models.User) -> None:
+    """
+    back-fill recent posts of followed account, so feed not wait for its next post.
+    """
+    if is_high_follower(followed):
+        return
+    rows = await db.execute(
+        select(models.Post.id, models.Post.created_at) \
+        .where(models.Post.user_id == followed.id) \
+        .order_by(*NEWEST_FIRST) \
+        .limit(FEED_BACKFILL_SIZE)
+    )
+    entries = {id: _score(created_at) for id, created_at in rows}
+    if entries:
+        async with redis_cli.pipeline(transaction=False) as pipeline:
+            _push(pipeline, follower_id, entries)
+            await pipeline.execute()
+
+
+async def on_unfollow(db: AsyncSession, redis_cli: Redis, follower_id: int, followed_id: int) -> None:
+    post_ids = (await db.scalars(
+        select(models.Post.id) \
+        .where(models.Post.user_id == followed_id) \
+        .order_by(*NEWEST_FIRST) \
+        .limit(FEED_MAX_LENGTH)
+    )).all()
+    if post_ids:
+        await redis_cli.zrem(_feed_key(follower_id), *post_ids)
+
+
+async def read_feed(db: AsyncSession, redis_cli: Redis, user_id: int, limit: int, before: tuple[float, int] | None = None) -> List[tuple[int, float]]:
+    """
+    newest (post id, score) pairs of user feed after cursor position before (score, post id), at most limit.
+    """
+    if before is None:
+        pushed = await redis_cli.zrevrangebyscore(_feed_key(user_id), '+inf', '-inf', start=0, num=limit, withscores=True)
+    else:
+        score, last_id = before
+        async with redis_cli.pipeline(transaction=False) as pipeline:
+            pipeline.zrevrangebyscore(_feed_key(user_id), score, score, withscores=True) # same score as cursor, tie-break by id
+            pipeline.zrevrangebyscore(_feed_key(user_id), f"({score}", '-inf', start=0, num=limit, withscores=True)
+            ties, older = await pipeline.execute()
+        ties = sorted((entry for entry in ties if int(entry[0]) < last_id), key=lambda entry: int(entry[0]), reverse=True)
+        pushed = (ties + older)[:limit]
+    entries = {int(id): score for id, score in pushed}
+
+    followed = select(models.Follow.followed_id).where(models.Follow.follower_id == user_id)
+    if len(pushed) == limit:
+        # window cover the page, pull only accounts that never pushed
+        followed = followed.join(models.User, models.User.id == models.Follow.followed_id) \
+                .where(models.User.followers_count >= FEED_FANOUT_MAX_FOLLOWERS)
+        authors = models.Post.user_id.in_(followed)
+    else:
+        authors = or_(models.Post.user_id.in_(followed), models.Post.user_id == user_id)
+
+    # per author walk on ix_posts_user_id_created_at_id
+    stmt = select(models.Post.id, models.Post.created_at).where(authors).order_by(*NEWEST_FIRST).limit(limit)
+    if before is not None:
+        stmt = stmt.where(tuple_(models.Post.created_at, models.Post.id) < (datetime.fromtimestamp(before[0], tz=timezone.utc), before[1]))
+    for id, created_at in await db.execute(stmt):
+        entries.setdefault(id, _score(created_at))
+
+    return sorted(entries.items(), key=lambda entry: (entry[1], entry[0]), reverse=True)[:limit]
+
+
+async def hydrate(db: AsyncSession, post_ids: List[int]) -> List[Row]:
+    """
+    (Post, like_count) rows in post_ids order, single query (authors joined), missing posts skipped.
+    """
+    if not post_ids:
+        return []
+    rows = await db.execute(
+        select(models.Post, models.Post.like_count) \
+        .where(models.Post.id.in_(post_ids)) \
+        .options(WITH_AUTHOR)
+    )
+    by_id = {row[0].id: row for row in rows}
+    return [by_id[id] for id in post_ids if id in by_id]
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List
+from redis.asyncio import Redis
+from sqlalchemy import exists, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .config import LIKES_WRITE_BEHIND, LIKES_FLUSH_INTERVAL_SECONDS, LIKES_FLUSH_BATCH_SIZE, LIKES_FLUSH_LOCK_SECONDS
+from .database import SessionLocal
+from .schemas.postSchemas import PostLine
+from .token_store import get_redis
+
+# Write-Behind Likes (optional, LIKES_WRITE_BEHIND)
+# [*] like/unlike only recorded in redis: pending hash "user_id:post_id" -> "wanted:initial" (1 liked, 0 not), delta hash post_id -> +/- count.
+# [*] request path: one read (post exists + liked before) and one redis script, no write transaction on hot posts.
+# [*] flusher move a batch pending -> flushing (with its deltas) atomically, apply it in ONE statement, then delete flushing.
+# [*] crash-safe: flushing left behind is replayed first, applying is idempotent (ON CONFLICT DO NOTHING / DELETE,
+#     like_count moved by rows really changed), so replaying an already committed batch change nothing.
+# [*] reads merge: like_count in postgres + pending delta + flushing delta.
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "like_buffer:pending"
+DELTA_KEY = "like_buffer:delta"
+FLUSHING_KEY = "like_buffer:flushing"
+FLUSHING_DELTA_KEY = "like_buffer:flushing_delta"
+LOCK_KEY = "like_buffer:lock" # one flusher at a time across workers
+
+_stats: Dict[str, float | int | None] = {"flushes": 0, "flushed_rows": 0, "failures": 0, "last_flush_at": None}
+
+
+# KEYS: pending, delta, flushing / ARGV: field, post_id, wanted, state in postgres
+# current state = pending, else batch being flushed, else postgres. return 1 when state changed.
+_RECORD_LUA = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+local initial
+if current then
+    initial = string.sub(current, 3, 3)
+    current = string.sub(current, 1, 1)
+else
+    current = redis.call('HGET', KEYS[3], ARGV[1])
+    if current then current = string.sub(current, 1, 1) else current = ARGV[4] end
+    initial = current
+end
+if current == ARGV[3] then return 0 end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[3] .. ':' .. initial)
+if redis.call('HINCRBY', KEYS[2], ARGV[2], ARGV[3] == '1' and 1 or -1) == 0 then
+    redis.call('HDEL', KEYS[2], ARGV[2])
+end
+return 1
+"""
+
+# KEYS: pending, delta, flushing, flushing_delta / ARGV: batch size
+# return -1 when previous batch still there (replay it), else number of moved entries.
+_DRAIN_LUA = """
+if redis.call('EXISTS', KEYS[3]) == 1 then return -1 end
+local items = redis.call('HSCAN', KEYS[1], 0, 'COUNT', ARGV[1])[2]
+local moved = 0
+for i = 1, #items, 2 do
+    local field, value = items[i], items[i + 1]
+    local post_id = string.match(field, ':(%d+)$')
+    local contribution = tonumber(string.sub(value, 1, 1)) - tonumber(string.sub(value, 3, 3))
+    redis.call('HSET', KEYS[3], field, value)
+    redis.call('HDEL', KEYS[1], field)
+    if contribution ~= 0 then
+        if redis.call('HINCRBY', KEYS[2], post_id, -contribution) == 0 then redis.call('HDEL', KEYS[2], post_id) end
+        redis.call('HINCRBY', KEYS[4], post_id, contribution)
+    end
+    moved = moved + 1
+end
+return moved
+"""
+
+# users/posts deleted meanwhile skipped by the joins, counters moved only by rows really inserted/deleted
+_APPLY_SQL = text("""
+WITH liked AS (
+    INSERT INTO likes (user_id, post_id)
+    SELECT v.user_id, v.post_id
+    FROM unnest(CAST(:like_users AS integer[]), CAST(:like_posts AS integer[])) AS v(user_id, post_id)
+    JOIN posts ON posts.id = v.post_id
+    JOIN users ON users.id = v.user_id
+    ON CONFLICT DO NOTHING
+    RETURNING post_id
+), unliked AS (
+    DELETE FROM likes
+    USING unnest(CAST(:unlike_users AS integer[]), CAST(:unlike_posts AS integer[])) AS v(user_id, post_id)
+    WHERE likes.user_id = v.user_id AND likes.post_id = v.post_id
+    RETURNING likes.post_id
+), changes AS (
+    SELECT post_id, COUNT(*) AS change FROM liked GROUP BY post_id
+    UNION ALL
+    SELECT post_id, -COUNT(*) AS change FROM unliked GROUP BY post_id
+)
+UPDATE posts SET like_count = posts.like_count + totals.change
+FROM (SELECT post_id, SUM(change) AS change FROM changes GROUP BY post_id) AS totals
+WHERE posts.id = totals.post_id
+""")
+
+
+def _field(user_id: int, post_id: int) -> str:
+    return f"{user_id}:{post_id}"
+
+
+async def record(db: AsyncSession, redis_cli: Redis, user_id: int, post_ids: List[int], liked: bool) -> tuple[List[int], List[int]]:
+    """
+    buffer like (liked=True) / unlike of posts, return (changed post ids, missing post ids).
+    posts already in wanted state are neither changed nor missing.
+    """
+    liked_before = exists().where(models.Likes.user_id == user_id, models.Likes.post_id == models.Post.id)
+    found = dict((await db.execute(select(models.Post.id, liked_before).where(models.Post.id.in_(post_ids)))).all())
+
+    script = redis_cli.register_script(_RECORD_LUA)
+    async with redis_cli.pipeline(transaction=False) as pipeline:
+        for post_id, state in found.items():
+            await script(
+                keys=[PENDING_KEY, DELTA_KEY, FLUSHING_KEY],
+                args=[_field(user_id, post_id), post_id, '1' if liked else '0', '1' if state else '0'],
+                client=pipeline,
+            )
+        results = await pipeline.execute()
+
+    changed = [post_id for post_id, result in zip(found, results) if result]
+    missing = [post_id for post_id in post_ids if post_id not in found]
+    return changed, missing
+
+
+async def merge_counts(redis_cli: Redis, lines: List[PostLine]) -> None:
+    """
+    add buffered (not flushed yet) likes to no_likes of the lines, in place.
+    """
+    if not LIKES_WRITE_BEHIND or not lines:
+        return
+    ids = [line.post.id for line in lines]
+    async with redis_cli.pipeline(transaction=False) as pipeline:
+        pipeline.hmget(DELTA_KEY, ids)
+        pipeline.hmget(FLUSHING_DELTA_KEY, ids)
+        pending, flushing = await pipeline.execute()
+    for line, delta, flushing_delta in zip(lines, pending, flushing):
+        line.no_likes += int(delta or 0) + int(flushing_delta or 0)
+
+
+# Flusher
+
+async def _apply(redis_cli: Redis) -> int:
+    entries = await redis_cli.hgetall(FLUSHING_KEY)
+    like_users, like_posts, unlike_users, unlike_posts = [], [], [], []
+    for field, value in entries.items():
+        wanted, initial = value.split(':')
+        if wanted == initial:
+            continue # liked and unliked (or reverse) before flush, nothing to write
+        user_id, post_id = map(int, field.split(':'))
+        if wanted == '1':
+            like_users.append(user_id)
+            like_posts.append(post_id)
+        else:
+            unlike_users.append(user_id)
+            unlike_posts.append(post_id)
+
+    if like_users or unlike_users:
+        async with SessionLocal() as db:
+            await db.execute(_APPLY_SQL, {
+                "like_users": like_users, "like_posts": like_posts,
+                "unlike_users": unlike_users, "unlike_posts": unlike_posts,
+            })
+            await db.commit()
+
+    # committed, batch done (crash before this line -> replayed, no effect second time)
+    await redis_cli.delete(FLUSHING_KEY, FLUSHING_DELTA_KEY)
+    return len(entries)
+
+
+async def flush(redis_cli: Redis | None = None) -> int:
+    """
+    drain buffer into postgres batch by batch, return number of flushed entries.
+    """
+    redis_cli = redis_cli or get_redis()
+    if not await redis_cli.set(LOCK_KEY, '1', nx=True, ex=LIKES_FLUSH_LOCK_SECONDS):
+        return 0 # other worker flushing
+
+    drain = redis_cli.register_script(_DRAIN_LUA)
+    flushed = 0
+    try:
+        while True:
+            moved = await drain(keys=[PENDING_KEY, DELTA_KEY, FLUSHING_KEY, FLUSHING_DELTA_KEY], args=[LIKES_FLUSH_BATCH_SIZE])
+            if moved == 0:
+                break
+            flushed += await _apply(redis_cli)
+            if 0 < moved < LIKES_FLUSH_BATCH_SIZE:
+                break # drained, rest wait for next run
+    finally:
+        await redis_cli.delete(LOCK_KEY)
+
+    _stats["flushes"] += 1
+    _stats["flushed_rows"] += flushed
+    _stats["last_flush_at"] = time.time()
+    return flushed
+
+
+async def run_periodic_flush() -> None:
+    """
+    background task, started on app startup when LIKES_WRITE_BEHIND enabled.
+    """
+    while True:
+        await asyncio.sleep(LIKES_FLUSH_INTERVAL_SECONDS)
+        try:
+            await flush()
+        except Exception:
+            _stats["failures"] += 1
+            logger.exception("likes flush failed, batch kept in redis for replay")
+
+
+def like_buffer_stats() -> Dict[str, float | int | None]:
+    return dict(_stats)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .config import LIKE_COUNT_CHECK_INTERVAL_SECONDS, LIKE_COUNT_AUTO_FIX
+from .database import SessionLocal
+from .token_store import get_redis
+
+# Like Counter Consistency
+# [*] posts.like_count updated in same transaction as likes insert/delete, so normally never drift.
+# [*] drift still possible (manual SQL, bulk imports, old code), checker compare it with real COUNT and fix it.
+# [*] run periodically from app startup, or manually: `python -m app.like_counter [--fix]`
+# [*] periodic check run by one worker per interval (redis lock), not by every worker at the same time.
+# [*] repair lock drifted posts first (own statement), recount in next statement: its snapshot see every
+#     like committed before the lock, new likes wait for it, so repair never overwrite a concurrent increment.
+
+LOCK_KEY = "like_counter:lock"
+
+logger = logging.getLogger(__name__)
+
+_stats: Dict[str, float | int | None] = {"last_check_at": None, "last_drift": 0, "total_fixed": 0}
+
+
+def _real_counts():
+    return select(models.Likes.post_id, func.count(models.Likes.user_id).label('real_count')) \
+            .group_by(models.Likes.post_id) \
+            .subquery()
+
+
+async def find_drift(db: AsyncSession) -> List[tuple[int, int, int]]:
+    """
+    return (post_id, stored like_count, real count) of posts that drifted.
+    """
+    real = _real_counts()
+    real_count = func.coalesce(real.c.real_count, 0)
+    rows = await db.execute(
+        select(models.Post.id, models.Post.like_count, real_count) \
+            .outerjoin(real, real.c.post_id == models.Post.id) \
+            .where(models.Post.like_count != real_count)
+    )
+    return [tuple(row) for row in rows]
+
+
+async def repair(db: AsyncSession, post_ids: List[int] | None = None) -> int:
+    """
+    set like_count to real count (all drifted posts or given ids only), return number of fixed posts.
+    """
+    if post_ids is None:
+        post_ids = [post_id for post_id, _, _ in await find_drift(db)]
+    if not post_ids:
+        return 0
+
+    # same lock order as likes bulk (sorted ids)
+    await db.execute(select(models.Post.id).where(models.Post.id.in_(post_ids)).order_by(models.Post.id).with_for_update())
+
+    real_count = select(func.count(models.Likes.user_id)) \
+            .where(models.Likes.post_id == models.Post.id) \
+            .scalar_subquery()
+    stmt = update(models.Post) \
+            .values(like_count=real_count) \
+            .where(models.Post.id.in_(post_ids), models.Post.like_count != real_count)
+
+    result = await db.execute(stmt.execution_options(synchronize_session=False))
+    await db.commit()
+    return result.rowcount
+
+
+async def check(fix: bool = LIKE_COUNT_AUTO_FIX) -> List[tuple[int, int, int]]:
+    async with SessionLocal() as db:
+        drift = await find_drift(db)
+        if drift:
+            logger.warning("like_count drift on %d posts: %s", len(drift), drift[:20])
+            if fix:
+                _stats["total_fixed"] += await repair(db, [post_id for post_id, _, _ in drift])
+
+    _stats["last_check_at"] = time.time()
+    _stats["last_drift"] = len(drift)
+    return drift
+
+
+async def run_periodic_check() -> None:
+    """
+    background task, started on app startup (every worker), only lock owner check.
+    """
+    while True:
+        await asyncio.sleep(LIKE_COUNT_CHECK_INTERVAL_SECONDS)
+        try:
+            # lock kept until it expire: one check per interval across workers
+            if not await get_redis().set(LOCK_KEY, '1', nx=True, ex=LIKE_COUNT_CHECK_INTERVAL_SECONDS):
+                continue
+            await check()
+        except Exception:
+            logger.exception("like_count consistency check failed")
+
+
+def like_counter_stats() -> Dict[str, float | int | None]:
+    return dict(_stats)
+
+
+if __name__ == '__main__':
+    import sys
+
+    async def main():
+        drift = await check(fix='--fix' in sys.argv)
+        for post_id, stored, real in drift:
+            print(f'post {post_id}: like_count {stored} real {real}')
+        print(f'{len(drift)} posts drifted' + (' (fixed)' if drift and '--fix' in sys.argv else ''))
+
+    asyncio.run(main())
@@ -1,28 +1,74 @@
-from fastapi import Depends, FastAPI
-import redis
+import asyncio
+import logging
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import ORJSONResponse
 import httpx
 
-from . import models
-from .database import engine
-from .routers import users, posts, auth, files, none, likes
-from .config import REDIS_HOSTNAME, REDIS_PASSWORD, REDIS_PORT
+from . import models, query_counter
+from .database import engine, replica_engines, run_replica_health_checks
+from .routers import users, posts, auth, files, none, likes, follows, metrics
+from .storage_backends import get_storage
+from .token_store import close_pool
+from .utils import shutdown_hashing_pool
+from .like_counter import run_periodic_check
+from .multipart import run_periodic_cleanup
+from .storage import run_periodic_sweep
+from . import like_buffer
+from .config import LIKE_COUNT_CHECK_INTERVAL_SECONDS, MULTIPART_CLEANUP_INTERVAL_SECONDS, BLOB_SWEEP_INTERVAL_SECONDS, SQL_STATEMENTS_HEADER, LIKES_WRITE_BEHIND
 
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+app = FastAPI(default_response_class=ORJSONResponse) # orjson for every JSON response (orjson come with fastapi[all])
+
+for db_engine in (engine, *replica_engines):
+    query_counter.install(db_engine)
+
+
+if SQL_STATEMENTS_HEADER:
+    @app.middleware("http")
+    async def count_sql_statements(request: Request, call_next):
+        with query_counter.count_statements() as counter:
+            response = await call_next(request)
+        response.headers["X-SQL-Statements"] = str(counter.count)
+        return response
 
 
 @app.on_event("startup")
 async def startup_event():
-    app.state.redis_cli = redis.Redis(host=REDIS_HOSTNAME, port=REDIS_PORT, password=REDIS_PASSWORD, decode_responses=True)
     app.state.http_client = httpx.AsyncClient()
+    await get_storage().open() # s3: one client for the worker lifetime
+    app.state.background_tasks = []
+    if LIKE_COUNT_CHECK_INTERVAL_SECONDS:
+        app.state.background_tasks.append(asyncio.create_task(run_periodic_check()))
+    if MULTIPART_CLEANUP_INTERVAL_SECONDS:
+        app.state.background_tasks.append(asyncio.create_task(run_periodic_cleanup()))
+    if BLOB_SWEEP_INTERVAL_SECONDS:
+        app.state.background_tasks.append(asyncio.create_task(run_periodic_sweep()))
+    if replica_engines:
+        app.state.background_tasks.append(asyncio.create_task(run_replica_health_checks()))
+    if LIKES_WRITE_BEHIND:
+        app.state.background_tasks.append(asyncio.create_task(like_buffer.run_periodic_flush()))
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    app.state.redis_cli.close()
+    for task in app.state.background_tasks:
+        task.cancel()
+    if LIKES_WRITE_BEHIND:
+        try:
+            await like_buffer.flush() # last flush, anything left replayed by next start
+        except Exception:
+            logger.exception("likes flush on shutdown failed, batch kept in redis for replay")
+    await get_storage().close()
+    await close_pool()
+    await app.state.http_client.aclose()
+    shutdown_hashing_pool()
 
 app.include_router(users.router)
 app.include_router(posts.router) 
 app.include_router(auth.router)
 app.include_router(files.router)
 app.include_router(likes.router)
-app.include_router(none.router)
\ No newline at end of file
+app.include_router(follows.router)
+app.include_router(none.router)
+app.include_router(metrics.router)
\ No newline at end of file
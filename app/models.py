@@ -1,5 +1,6 @@
-from sqlalchemy import TIMESTAMP, Column, Integer, LargeBinary, String, Boolean, ForeignKey, text
-from sqlalchemy.orm import relationship
+from sqlalchemy import TIMESTAMP, BigInteger, Column, Computed, Index, Integer, LargeBinary, String, Boolean, ForeignKey, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from .database import Base
 
 class Post(Base):
@@ -12,8 +13,24 @@ class Post(Base):
     published = Column(Boolean,server_default='FALSE',nullable=False)
     created_at = Column(TIMESTAMP(timezone=True),nullable=False,server_default=text('now()'))
     user_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    like_count = Column(Integer, nullable=False, server_default=text('0')) # denormalized COUNT of likes, maintained by likes router
+    # full-text search document, generated by postgres (title weighted over content), deferred: never loaded with the post
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english'::regconfig, coalesce(content, '')), 'B')",
+        persisted=True,
+    )))
     
-    user = relationship('User') # Fetch Data from User Model
+    # Fetch Data from User Model, always eager loaded (WITH_AUTHOR), lazy load raise instead of silent query per post (N+1)
+    user = relationship('User', lazy='raise_on_sql')
+
+    __table_args__ = (
+        # keyset pagination, newest first: WHERE (created_at, id) < (:c, :i) ORDER BY created_at DESC, id DESC
+        Index('ix_posts_created_at_id', created_at.desc(), id.desc()),
+        # same walk restricted to one author (/posts/me): WHERE user_id = :u AND (created_at, id) < (:c, :i)
+        Index('ix_posts_user_id_created_at_id', 'user_id', created_at.desc(), id.desc()),
+        Index('ix_posts_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
 
 class User(Base):
@@ -24,13 +41,43 @@ class User(Base):
     email = Column(String, unique=True, nullable=False, index=True)
     password = Column(String, nullable=False)
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    followers_count = Column(Integer, nullable=False, server_default=text('0')) # denormalized COUNT of follows, maintained by follows router
+
+
+class Follow(Base):
+    # follower_id follow followed_id
+    __tablename__ = "follows"
+
+    follower_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True, nullable=False)
+    followed_id = Column(Integer, ForeignKey('users.id', ondelete="CASCADE"), primary_key=True, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+
+    __table_args__ = (
+        # fan-out: WHERE followed_id = :author (primary key only serve follower_id lookups)
+        Index('ix_follows_followed_id', 'followed_id'),
+    )
+
+
+class Blob(Base):
+    # stored content, one row per distinct sha256 (content-addressed, deduplicated)
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, server_default=text('0')) # number of files rows pointing to it
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+
 
+class File(Base):
+    __tablename__ = "files"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    filename = Column(String, nullable=False)
+    sha256 = Column(String(64), ForeignKey('blobs.sha256'), nullable=False, index=True)
+    cache_control = Column(String, nullable=True) # Cache-Control of downloads, null -> FILE_CACHE_CONTROL default
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
 
-# class File(Base):
-#     __tablename__ = "files"
-#     id = Column(Integer, primary_key=True, index=True)
-#     filename = Column(String, index=True)
-#     dir = Column(String)
+    blob = relationship('Blob')
 
 class Likes(Base):
     __tablename__ = "likes"
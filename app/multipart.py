@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Dict
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from redis.asyncio import Redis
+
+from .config import MULTIPART_DIR, MULTIPART_UPLOAD_TTL_SECONDS, MULTIPART_MAX_PARTS, MULTIPART_CLEANUP_INTERVAL_SECONDS, UPLOAD_MAX_SIZE
+from .storage import save_stream
+from .token_store import get_redis
+
+# Resumable Multipart Uploads
+# [*] initiate -> upload numbered parts (any order, in parallel, retry any part) -> complete.
+# [*] state in redis: multipart:{id} hash (filename ...), multipart:{id}:parts hash (part number -> "size:sha256"), both expire with ttl.
+# [*] each part stored as own file under MULTIPART_DIR/{id}/, complete concatenate them by kernel copy (sendfile), no data through python memory.
+# [*] abandoned sessions: redis keys expire, cleanup task remove their part directories.
+# [*] session "size" field = bytes of all parts (counted while received), 413 as soon as it would exceed UPLOAD_MAX_SIZE,
+#     one session can't fill the disk with many parts. failed part give its bytes back, replaced part its old size.
+
+logger = logging.getLogger(__name__)
+
+
+def _session_key(upload_id: str) -> str:
+    return f"multipart:{upload_id}"
+
+
+def _parts_key(upload_id: str) -> str:
+    return f"multipart:{upload_id}:parts"
+
+
+def _session_dir(upload_id: str) -> Path:
+    # upload id come from url, only accept our own ids (never '..' or path like)
+    if len(upload_id) != 32 or not all(c in '0123456789abcdef' for c in upload_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"upload {upload_id} doesn't exisit or expired")
+    return MULTIPART_DIR / upload_id
+
+
+async def initiate(redis_cli: Redis, filename: str, cache_control: str | None = None) -> str:
+    upload_id = uuid.uuid4().hex
+    await run_in_threadpool(_session_dir(upload_id).mkdir)
+    session = {"filename": filename, "created_at": time.time()}
+    if cache_control:
+        session["cache_control"] = cache_control
+    async with redis_cli.pipeline(transaction=True) as pipeline:
+        pipeline.hset(_session_key(upload_id), mapping=session)
+        pipeline.expire(_session_key(upload_id), MULTIPART_UPLOAD_TTL_SECONDS)
+        await pipeline.execute()
+    return upload_id
+
+
+async def get_session(redis_cli: Redis, upload_id: str) -> Dict[str, str]:
+    session = await redis_cli.hgetall(_session_key(upload_id))
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"upload {upload_id} doesn't exisit or expired")
+    return session
+
+
+async def list_parts(redis_cli: Redis, upload_id: str) -> Dict[int, Dict[str, int | str]]:
+    parts = await redis_cli.hgetall(_parts_key(upload_id))
+    result = {}
+    for number, value in parts.items():
+        size, checksum = value.split(':')
+        result[int(number)] = {"size": int(size), "sha256": checksum}
+    return dict(sorted(result.items()))
+
+
+# KEYS: session / ARGV: bytes. return new total, -1 when session expired (never recreate it).
+_RESERVE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return -1 end
+return redis.call('HINCRBY', KEYS[1], 'size', ARGV[1])
+"""
+
+# KEYS: parts, session / ARGV: part number, "size:sha256", ttl. previous size of the part given back.
+_SET_PART_LUA = """
+local old = redis.call('HGET', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+if old and redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('HINCRBY', KEYS[2], 'size', -tonumber(string.match(old, '^(%d+):')))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+"""
+
+
+async def _counted(redis_cli: Redis, upload_id: str, chunks: AsyncIterator[bytes], received: list[int]) -> AsyncIterator[bytes]:
+    reserve = redis_cli.register_script(_RESERVE_LUA)
+    async for chunk in chunks:
+        total = await reserve(keys=[_session_key(upload_id)], args=[len(chunk)])
+        if total < 0:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"upload {upload_id} doesn't exisit or expired")
+        received[0] += len(chunk)
+        if UPLOAD_MAX_SIZE and total > UPLOAD_MAX_SIZE:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"file larger than {UPLOAD_MAX_SIZE} bytes")
+        yield chunk
+
+
+async def upload_part(redis_cli: Redis, upload_id: str, part_number: int, chunks: AsyncIterator[bytes]) -> tuple[int, str]:
+    """
+    store part (replace it if uploaded before), return (size, sha256).
+    """
+    if not 1 <= part_number <= MULTIPART_MAX_PARTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"part number should be between 1 and {MULTIPART_MAX_PARTS}")
+    await get_session(redis_cli, upload_id)
+
+    received = [0] # bytes counted in session total by this request
+    try:
+        size, checksum = await save_stream(_counted(redis_cli, upload_id, chunks, received), _session_dir(upload_id) / str(part_number))
+    except BaseException:
+        if received[0]:
+            await redis_cli.register_script(_RESERVE_LUA)(keys=[_session_key(upload_id)], args=[-received[0]])
+        raise
+
+    # activity keep session alive
+    set_part = redis_cli.register_script(_SET_PART_LUA)
+    await set_part(keys=[_parts_key(upload_id), _session_key(upload_id)], args=[part_number, f"{size}:{checksum}", MULTIPART_UPLOAD_TTL_SECONDS])
+    return size, checksum
+
+
+async def complete(redis_cli: Redis, upload_id: str, destination: Path) -> tuple[str, int]:
+    """
+    assemble parts 1..N into destination, return (filename, size). parts should be consecutive.
+    session not removed, call abort after the file is stored.
+    """
+    session = await get_session(redis_cli, upload_id)
+    parts = await list_parts(redis_cli, upload_id)
+    if not parts:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="no parts uploaded")
+
+    missing = sorted(set(range(1, max(parts) + 1)) - set(parts))
+    if missing:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"missing parts {missing[:20]}")
+
+    size = sum(part["size"] for part in parts.values())
+    if UPLOAD_MAX_SIZE and size > UPLOAD_MAX_SIZE:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"file larger than {UPLOAD_MAX_SIZE} bytes")
+
+    part_paths = [_session_dir(upload_id) / str(number) for number in parts]
+    await run_in_threadpool(_concatenate, part_paths, destination)
+    # session kept: caller abort it once the file is committed, failed commit can be retried
+    return session["filename"], size
+
+
+async def abort(redis_cli: Redis, upload_id: str) -> None:
+    await redis_cli.delete(_session_key(upload_id), _parts_key(upload_id))
+    await run_in_threadpool(shutil.rmtree, _session_dir(upload_id), True)
+
+
+def _concatenate(part_paths: list[Path], destination: Path) -> None:
+    temp = destination.with_name(f".assemble-{uuid.uuid4().hex}")
+    try:
+        with open(temp, 'wb') as out:
+            for path in part_paths:
+                with open(path, 'rb') as part:
+                    _copy(part, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(temp, destination)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+
+
+def _copy(src, dst) -> None:
+    """
+    kernel side copy (sendfile), fallback to chunked copy when not supported.
+    """
+    remaining = os.fstat(src.fileno()).st_size
+    try:
+        while remaining > 0:
+            sent = os.sendfile(dst.fileno(), src.fileno(), None, remaining)
+            if sent == 0:
+                break
+            remaining -= sent
+    except (AttributeError, OSError):
+        shutil.copyfileobj(src, dst)
+
+
+# Cleanup
+
+async def cleanup_abandoned(redis_cli: Redis) -> int:
+    """
+    remove part directories of sessions that expired in redis, return number of removed sessions.
+    """
+    removed = 0
+    session_dirs = await run_in_threadpool(lambda: [path for path in MULTIPART_DIR.iterdir() if path.is_dir()])
+    for path in session_dirs:
+        if await redis_cli.exists(_session_key(path.name)):
+            continue
+        # grace period, session may be created right now (dir made before redis key)
+        if time.time() - (await asyncio.to_thread(path.stat)).st_mtime < 60:
+            continue
+        await run_in_threadpool(shutil.rmtree, path, True)
+        removed += 1
+    return removed
+
+
+async def run_periodic_cleanup() -> None:
+    """
+    background task, started on app startup.
+    """
+    while True:
+        await asyncio.sleep(MULTIPART_CLEANUP_INTERVAL_SECONDS)
+        try:
+            removed = await cleanup_abandoned(get_redis())
+            if removed:
+                logger.info("removed %d abandoned multipart uploads", removed)
+        except Exception:
+            logger.exception("multipart uploads cleanup failed")
@@ -0,0 +1,183 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+from fastapi import HTTPException, status
+from redis.asyncio import Redis
+from sqlalchemy import Select, desc, func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from . import models
+from .config import POSTS_COUNT_CACHE_TTL_SECONDS
+from .schemas.postSchemas import CountStrategy, PostLine, PostsLinePaginator
+
+# Keyset (Cursor) Pagination
+# [*] offset pagination read and drop all skipped rows, page 10,000 cost 10,000 pages.
+# [*] cursor = last seen (created_at, id), next page start right after it using index posts(created_at DESC, id DESC).
+# [*] new inserted posts not shift pages, cursor still point to same place.
+
+NEWEST_FIRST = (desc(models.Post.created_at), desc(models.Post.id))
+OLDEST_FIRST = (models.Post.created_at, models.Post.id)
+
+# [*] authors loaded in the same statement (many-to-one, inner join since user_id not null), page = one query
+WITH_AUTHOR = joinedload(models.Post.user, innerjoin=True)
+
+
+def encode_cursor(post: models.Post, direction: str) -> str:
+    raw = json.dumps({"c": post.created_at.isoformat(), "i": post.id, "d": direction})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int, str]:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        direction = raw["d"]
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.fromisoformat(raw["c"]), int(raw["i"]), direction
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
+
+
+async def paginate_by_cursor(db: AsyncSession, stmt: Select, per_page: int, cursor: str | None) -> PostsLinePaginator:
+    """
+    stmt: select of (Post, no_likes) rows, without order/limit.
+    fetch per_page + 1 rows to know if there is more in the walking direction.
+    """
+    if per_page < 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="per_page should be at least 1")
+
+    direction = 'next'
+    if cursor:
+        created_at, id, direction = decode_cursor(cursor)
+        key = tuple_(models.Post.created_at, models.Post.id)
+        stmt = stmt.where(key < (created_at, id) if direction == 'next' else key > (created_at, id))
+
+    stmt = stmt.order_by(*(NEWEST_FIRST if direction == 'next' else OLDEST_FIRST)).limit(per_page + 1)
+    rows = (await db.execute(stmt)).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse() # always return newest first
+
+    if direction == 'next':
+        has_next, has_pre = has_more, cursor is not None
+    else:
+        has_next, has_pre = True, has_more
+
+    return PostsLinePaginator(
+        result=[PostLine.model_validate(row, from_attributes=True) for row in rows],
+        count_strategy=CountStrategy.none,
+        has_next=has_next,
+        has_pre=has_pre,
+        next_cursor=encode_cursor(rows[-1][0], 'next') if rows and has_next else None,
+        prev_cursor=encode_cursor(rows[0][0], 'prev') if rows and has_pre else None,
+    )
+
+
+# Offset Pagination Count Strategies
+# [*] exact COUNT(*) scan all matched rows on every request (whole table for time-line).
+# [*] estimated: planner statistics, no scan. cached: exact once per ttl. none: skip count entirely.
+
+def _compile(db: AsyncSession, stmt: Select) -> tuple[str, dict]:
+    compiled = stmt.compile(dialect=db.get_bind().dialect)
+    return str(compiled), compiled.params
+
+
+async def _exact_count(db: AsyncSession, filters: list) -> int:
+    return await db.scalar(select(func.count(models.Post.id)).where(*filters))
+
+
+async def _estimated_count(db: AsyncSession, filters: list) -> int:
+    if not filters:
+        # -1 when table never analyzed yet
+        reltuples = await db.scalar(text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'posts'::regclass"))
+        if reltuples is not None and reltuples >= 0:
+            return reltuples
+        return await _exact_count(db, filters)
+
+    sql, params = _compile(db, select(models.Post.id).where(*filters))
+    connection = await db.connection()
+    plan = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def _cached_count(db: AsyncSession, redis_cli: Redis, filters: list) -> int:
+    sql, params = _compile(db, select(func.count(models.Post.id)).where(*filters))
+    key = "posts_count:" + hashlib.sha1(f"{sql}|{json.dumps(params, sort_keys=True, default=str)}".encode()).hexdigest()
+
+    if (cached := await redis_cli.get(key)) is not None:
+        return int(cached)
+
+    count = await _exact_count(db, filters)
+    await redis_cli.setex(key, POSTS_COUNT_CACHE_TTL_SECONDS, count)
+    return count
+
+
+async def count_posts(db: AsyncSession, redis_cli: Redis, filters: list, strategy: CountStrategy) -> int | None:
+    if strategy == CountStrategy.exact:
+        return await _exact_count(db, filters)
+    if strategy == CountStrategy.estimated:
+        return await _estimated_count(db, filters)
+    if strategy == CountStrategy.cached:
+        return await _cached_count(db, redis_cli, filters)
+    return None
+
+
+async def paginate_by_offset(
+    db: AsyncSession,
+    redis_cli: Redis,
+    stmt: Select,
+    filters: list,
+    page: int,
+    per_page: int,
+    strategy: CountStrategy,
+    empty_detail: str,
+    order_by: tuple = NEWEST_FIRST,
+) -> PostsLinePaginator:
+    """
+    stmt: select of (Post, no_likes) rows filtered by `filters`, without order/limit.
+    """
+    if per_page < 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="per_page should be at least 1")
+
+    count = await count_posts(db, redis_cli, filters, strategy)
+
+    if strategy == CountStrategy.exact:
+        if not count:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=empty_detail)
+        no_pages = count // per_page + (1 if count % per_page else 0) # 32 // 10 = 3 + is still has data ? yes then + 1 : no then + 0 => 4
+        if page > no_pages or page < 1: # Here Should at leaset the page = 1
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'page {page} out of range.')
+    elif page < 1:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'page {page} out of range.')
+
+    skip: int = ( page - 1 ) * per_page
+
+    # one extra row tell if next page exist, so estimated / missing count not affect has_next
+    rows = (await db.execute(stmt.order_by(*order_by).limit(per_page + 1).offset(skip))).all()
+    if not rows:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=empty_detail if page == 1 else f'page {page} out of range.')
+
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    no_pages = None
+    if count is not None:
+        # estimate can be behind real rows, never report less pages than reached
+        no_pages = max(count // per_page + (1 if count % per_page else 0), page + (1 if has_next else 0))
+
+    # validate each row directly (row.Post, row.like_count attributes), no intermediate dict
+    return PostsLinePaginator(
+        result=[PostLine.model_validate(row, from_attributes=True) for row in rows],
+        count_strategy=strategy,
+        count=count,
+        no_pages=no_pages,
+        current_page=page,
+        has_next=has_next,
+        has_pre=page > 1, # Other Cases All Handel it Before Reach Here.
+    )
@@ -0,0 +1,218 @@
+import codecs
+import csv
+import json
+from collections import deque
+from typing import AsyncIterator, List
+import psycopg
+from anyio import from_thread
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import POSTS_IMPORT_CHUNK_SIZE, POSTS_IMPORT_MAX_ERRORS, POSTS_IMPORT_MAX_RECORD_LENGTH
+from .schemas.postSchemas import CreatePostSchema, PostImportError, PostImportResult
+
+# Bulk Posts Import
+# [*] request body streamed line by line (NDJSON or CSV), never whole file in memory.
+# [*] each row validated with CreatePostSchema, invalid rows reported (line + errors), not stop the import.
+# [*] valid rows loaded by COPY in chunks of POSTS_IMPORT_CHUNK_SIZE, one transaction per chunk.
+# [*] chunk rejected by postgres -> only its rows reported failed, previous chunks already committed.
+# [*] NDJSON line / CSV record longer than POSTS_IMPORT_MAX_RECORD_LENGTH never buffered whole.
+# [*] CSV parsed by csv.reader (quoted new lines, escaped quotes), run in a worker thread pulling lines from the stream.
+
+COPY_SQL = "COPY posts (title, content, published, user_id) FROM STDIN"
+CSV_RECORDS_PER_CALL = 500 # records parsed per worker thread call
+
+# one csv field can be as long as a whole record, record length checked by _LineFeed
+csv.field_size_limit(max(csv.field_size_limit(), POSTS_IMPORT_MAX_RECORD_LENGTH))
+
+
+async def _line_batches(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[str | None]]:
+    """
+    lines of each received chunk (line ending removed), line longer than POSTS_IMPORT_MAX_RECORD_LENGTH -> None.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    skipping = False # inside a too long line, dropped until its end
+    try:
+        async for chunk in chunks:
+            buffer += decoder.decode(chunk)
+            *lines, buffer = buffer.split('\n')
+            batch = []
+            for line in lines:
+                too_long = skipping or len(line) > POSTS_IMPORT_MAX_RECORD_LENGTH
+                skipping = False
+                batch.append(None if too_long else line.removesuffix('\r'))
+            if len(buffer) > POSTS_IMPORT_MAX_RECORD_LENGTH:
+                buffer, skipping = '', True
+            if batch:
+                yield batch
+        buffer += decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="body should be utf-8")
+    if skipping or len(buffer) > POSTS_IMPORT_MAX_RECORD_LENGTH:
+        yield [None]
+    elif buffer:
+        yield [buffer.removesuffix('\r')]
+
+
+async def ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | str]]:
+    """
+    yield (line number, row) or (line number, error message).
+    """
+    number = 0
+    async for batch in _line_batches(chunks):
+        for line in batch:
+            number += 1
+            if line is None:
+                yield number, f"line longer than {POSTS_IMPORT_MAX_RECORD_LENGTH} characters"
+                continue
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, f"invalid json: {e.msg}"
+
+
+class _RecordTooLong(Exception):
+    pass
+
+
+class _LineFeed:
+    """
+    sync lines iterator for csv.reader, used from a worker thread: next batch of lines pulled from the event loop.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self.batches = _line_batches(chunks)
+        self.lines: deque[str | None] = deque()
+        self.record_length = 0 # characters read for the current record
+        self.call_length = 0 # characters read for the current worker call
+
+    async def _next_batch(self) -> List[str | None] | None:
+        return await anext(self.batches, None)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        while not self.lines:
+            batch = from_thread.run(self._next_batch)
+            if batch is None:
+                raise StopIteration
+            self.lines.extend(batch)
+        line = self.lines.popleft()
+        if line is None or self.record_length + len(line) > POSTS_IMPORT_MAX_RECORD_LENGTH:
+            raise _RecordTooLong(f"record longer than {POSTS_IMPORT_MAX_RECORD_LENGTH} characters")
+        self.record_length += len(line) + 1
+        self.call_length += len(line) + 1
+        return line + '\n' # kept, so csv.reader keep new lines inside quoted fields
+
+
+def _read_records(reader, feed: _LineFeed) -> tuple[List[tuple[int, List[str] | str]], bool]:
+    """
+    worker thread: parse next records, return ((first line, values or error), finished).
+    malformed csv can't be resynchronized (unknown if inside a quoted field), parsing stop at first error.
+    """
+    records = []
+    feed.call_length = 0
+    while len(records) < CSV_RECORDS_PER_CALL and feed.call_length < POSTS_IMPORT_MAX_RECORD_LENGTH:
+        start = reader.line_num + 1
+        feed.record_length = 0
+        try:
+            records.append((start, next(reader)))
+        except StopIteration:
+            return records, True
+        except (csv.Error, _RecordTooLong) as e:
+            records.append((start, f"invalid csv: {e}, rest of the file not imported"))
+            return records, True
+    return records, False
+
+
+async def csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | str]]:
+    """
+    first record is header (title, content, published optional), yield rows like ndjson_rows.
+    """
+    feed = _LineFeed(chunks)
+    reader = csv.reader(feed, strict=True) # strict: unterminated quoted field reported, not silently closed
+    header = None
+    finished = False
+    while not finished:
+        records, finished = await run_in_threadpool(_read_records, reader, feed)
+        for start, values in records:
+            if isinstance(values, str):
+                yield start, values
+                continue
+            if not values or (len(values) == 1 and not values[0].strip()):
+                continue # blank line
+
+            if header is None:
+                header = [name.strip() for name in values]
+                if not {'title', 'content'} <= set(header):
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="csv header should contain title and content")
+                continue
+            if len(values) != len(header):
+                yield start, f"expected {len(header)} columns, got {len(values)}"
+                continue
+            # empty published -> schema default
+            yield start, {name: value for name, value in zip(header, values) if value != '' or name != 'published'}
+
+
+class _Importer:
+
+    def __init__(self, db: AsyncSession, user_id: int):
+        self.db = db
+        self.user_id = user_id
+        self.result = PostImportResult(imported=0, failed=0, errors=[])
+        self.chunk: List[tuple] = []
+        self.chunk_lines: List[int] = []
+
+    def fail(self, line: int, errors: List[str]) -> None:
+        self.result.failed += 1
+        if len(self.result.errors) < POSTS_IMPORT_MAX_ERRORS:
+            self.result.errors.append(PostImportError(line=line, errors=errors))
+
+    async def add(self, line: int, row: dict | str) -> None:
+        if isinstance(row, str):
+            return self.fail(line, [row])
+        try:
+            post = CreatePostSchema.model_validate(row)
+        except ValidationError as e:
+            return self.fail(line, [f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}" for error in e.errors()])
+
+        self.chunk.append((post.title, post.content, post.published, self.user_id))
+        self.chunk_lines.append(line)
+        if len(self.chunk) >= POSTS_IMPORT_CHUNK_SIZE:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self.chunk:
+            return
+        chunk, lines = self.chunk, self.chunk_lines
+        self.chunk, self.chunk_lines = [], []
+
+        # psycopg COPY through the session connection (same pool, same transaction handling)
+        connection = await self.db.connection()
+        raw = (await connection.get_raw_connection()).driver_connection
+        try:
+            async with raw.cursor() as cursor:
+                async with cursor.copy(COPY_SQL) as copy:
+                    for row in chunk:
+                        await copy.write_row(row)
+            await self.db.commit()
+        except psycopg.Error as e:
+            await self.db.rollback()
+            for line in lines:
+                self.fail(line, [f"rejected by database: {e}"])
+            return
+        self.result.imported += len(chunk)
+
+
+async def import_posts(db: AsyncSession, user_id: int, rows: AsyncIterator[tuple[int, dict | str]]) -> PostImportResult:
+    importer = _Importer(db, user_id)
+    async for line, row in rows:
+        await importer.add(line, row)
+    await importer.flush()
+    return importer.result
@@ -0,0 +1,55 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# SQL Statements Counter
+# [*] count statements sent to postgres inside a block (request, script, CI check), catch N+1 regressions.
+# [*] counter in a context var, concurrent requests never count each other statements.
+# [*] enable per response header with SQL_STATEMENTS_HEADER, or use assert_max_statements around any call.
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements: list[str] = []
+
+
+_current: ContextVar[StatementCounter | None] = ContextVar('sql_statement_counter', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _current.get()
+    if counter is not None:
+        counter.count += 1
+        counter.statements.append(statement)
+
+
+def install(engine: AsyncEngine) -> None:
+    event.listen(engine.sync_engine, 'before_cursor_execute', _before_cursor_execute)
+
+
+@contextmanager
+def count_statements() -> Iterator[StatementCounter]:
+    counter = StatementCounter()
+    token = _current.set(counter)
+    try:
+        yield counter
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_statements(limit: int) -> Iterator[StatementCounter]:
+    """
+    raise AssertionError when block run more than limit statements, e.g. in CI:
+
+        with assert_max_statements(2):
+            await get_posts_time_line(...)
+    """
+    with count_statements() as counter:
+        yield counter
+    if counter.count > limit:
+        statements = '\n'.join(counter.statements)
+        raise AssertionError(f"expected at most {limit} SQL statements, got {counter.count}:\n{statements}")
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+from fastapi.responses import Response
+from redis.asyncio import Redis
+
+from .config import RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_STALE_SECONDS, RESPONSE_CACHE_LOCK_SECONDS
+from .schemas.postSchemas import PostsLinePaginator
+
+# Posts Listing Response Cache (redis, shared by all workers)
+# [*] page key = generation + endpoint + hash of query params, value = "fresh_until\n<serialized json>".
+# [*] fresh for TTL, then kept STALE seconds more: one request (holding lock) rebuild it, others keep serving stale.
+# [*] miss without stale copy: lock winner compute it, others wait for it (single-flight, no stampede on postgres).
+# [*] create/update/delete post -> bump generation (pages shift or search matches change), old pages just expire.
+# [*] like -> only pages that contain the post dropped (posts_cache:post:{id} -> set of page keys).
+# [*] pages built from read replica, replica lag can keep old data at most one TTL after invalidation.
+
+GENERATION_KEY = "posts_cache:generation"
+POLL_INTERVAL = 0.05 # seconds, waiting for lock owner to fill the page
+
+_stats: Dict[str, int] = {"hits": 0, "stale_hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _post_key(post_id: int) -> str:
+    return f"posts_cache:post:{post_id}"
+
+
+async def _page_key(redis_cli: Redis, name: str, params: Dict[str, Any]) -> str:
+    generation = await redis_cli.get(GENERATION_KEY) or '0'
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:32]
+    return f"posts_cache:{generation}:{name}:{digest}"
+
+
+def _response(body: str, cache_status: str) -> Response:
+    return Response(content=body, media_type='application/json', headers={"X-Cache": cache_status})
+
+
+async def _refresh(redis_cli: Redis, key: str, lock: str, compute: Callable[[], Awaitable[PostsLinePaginator]]) -> str:
+    """
+    compute page, store it and index it by its posts, always release the lock.
+    """
+    try:
+        page = await compute()
+        body = page.model_dump_json()
+        expire = RESPONSE_CACHE_TTL_SECONDS + RESPONSE_CACHE_STALE_SECONDS
+        async with redis_cli.pipeline(transaction=False) as pipeline:
+            pipeline.set(key, f"{time.time() + RESPONSE_CACHE_TTL_SECONDS}\n{body}", ex=expire)
+            for line in page.result:
+                pipeline.sadd(_post_key(line.post.id), key)
+                pipeline.expire(_post_key(line.post.id), expire)
+            await pipeline.execute()
+        return body
+    finally:
+        await redis_cli.delete(lock)
+
+
+async def cached_page(redis_cli: Redis, name: str, params: Dict[str, Any], compute: Callable[[], Awaitable[PostsLinePaginator]]) -> Response:
+    """
+    serve page from cache, compute (touching postgres) only on miss.
+    compute errors (like 404 no posts) not cached, raised to the caller.
+    """
+    if not RESPONSE_CACHE_TTL_SECONDS:
+        return _response((await compute()).model_dump_json(), 'BYPASS')
+
+    key = await _page_key(redis_cli, name, params)
+    lock = f"{key}:lock"
+
+    entry = await redis_cli.get(key)
+    if entry is not None:
+        fresh_until, body = entry.split('\n', 1)
+        if float(fresh_until) > time.time():
+            _stats["hits"] += 1
+            return _response(body, 'HIT')
+        if not await redis_cli.set(lock, '1', nx=True, ex=RESPONSE_CACHE_LOCK_SECONDS):
+            _stats["stale_hits"] += 1
+            return _response(body, 'STALE') # someone else rebuilding it
+        _stats["misses"] += 1
+        return _response(await _refresh(redis_cli, key, lock, compute), 'MISS')
+
+    _stats["misses"] += 1
+    if await redis_cli.set(lock, '1', nx=True, ex=RESPONSE_CACHE_LOCK_SECONDS):
+        return _response(await _refresh(redis_cli, key, lock, compute), 'MISS')
+
+    # wait for lock owner, stop waiting when lock released without value (owner failed) or expired
+    deadline = time.time() + RESPONSE_CACHE_LOCK_SECONDS
+    while time.time() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        entry = await redis_cli.get(key)
+        if entry is not None:
+            return _response(entry.split('\n', 1)[1], 'HIT')
+        if not await redis_cli.exists(lock):
+            break
+
+    return _response((await compute()).model_dump_json(), 'MISS')
+
+
+async def invalidate_post(redis_cli: Redis, post_id: int) -> None:
+    """
+    drop cached pages containing the post (e.g. its like count changed).
+    """
+    await invalidate_posts(redis_cli, [post_id])
+
+
+async def invalidate_posts(redis_cli: Redis, post_ids: List[int]) -> None:
+    if not post_ids:
+        return
+    async with redis_cli.pipeline(transaction=False) as pipeline:
+        for post_id in post_ids:
+            pipeline.smembers(_post_key(post_id))
+        pages = await pipeline.execute()
+    keys = set().union(*pages)
+    await redis_cli.delete(*(_post_key(post_id) for post_id in post_ids), *keys)
+    _stats["invalidations"] += 1
+
+
+async def invalidate_all(redis_cli: Redis) -> None:
+    """
+    new generation, every cached listing page become unreachable (expire by its own ttl).
+    """
+    await redis_cli.incr(GENERATION_KEY)
+    _stats["invalidations"] += 1
+
+
+def cache_stats() -> Dict[str, int]:
+    return dict(_stats)
@@ -0,0 +1,12 @@
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+# Fast JSON Responses
+# [*] app default response class is ORJSONResponse (see main), orjson encode much faster than stdlib json.
+# [*] endpoints that already built their pydantic model return model_response: serialized once by pydantic-core,
+#     FastAPI return Response objects as is, no second validation against response_model and no jsonable_encoder pass.
+# [*] keep response_model=... on the route, still used for docs (openapi).
+
+
+def model_response(model: BaseModel, status_code: int = 200, headers: dict | None = None) -> Response:
+    return Response(content=model.model_dump_json(), status_code=status_code, media_type='application/json', headers=headers)
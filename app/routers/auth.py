@@ -2,10 +2,12 @@ from asyncio import gather
 from datetime import timedelta
 from typing import Annotated
 from fastapi import APIRouter, Depends, Request, status, HTTPException, Response
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 
 from ..database import get_db
+from ..token_store import get_redis
+from .. import throttle
 from ..schemas import tokenSchema
 from ..config import ACCESS_TOKEN_EXPIRE_MINUTES
 
@@ -16,7 +18,6 @@ router = APIRouter(
     tags= ['Authentication']
 )
 
-import time
 # [*] Generate Form via [OAuth2PasswordRequestForm]
 # [*] the data that send Shold be in Form not JSON
 # [*] as we Know, Fastapi Serializer Automatically Pytdantic object into JSON
@@ -24,32 +25,35 @@ import time
 async def login_for_access_token(
     request: Request,
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    redis_cli: Redis = Depends(get_redis),
 ) -> tokenSchema.Tokens:
     """
     handle login process.
     """
-    print('start execution')
+    client_ip = request.client.host if request.client else 'unknown'
+    attempt = await throttle.begin_login(redis_cli, form_data.username, client_ip) # slow down / block brute-force clients only
+
     user = await authenticate_user(db, form_data.username, form_data.password)
-    time.sleep(2)
-    if not user:
+    if not user: # attempt already counted as failure by begin_login
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    await throttle.login_succeeded(redis_cli, form_data.username, client_ip, attempt)
+
     data = {"id": user.id, "email": user.email}
-    access_token, refresh_token = await generate_tokens(data, request.app.state.redis_cli)
-    print('end execution')
+    access_token, refresh_token = await generate_tokens(data, redis_cli)
     return tokenSchema.Tokens(access_token=access_token, refresh_token=refresh_token, token_type='bearer')
 
 
 @router.post("/refresh")
-async def refresh_token(request: Request, refresh_token: str, db: Session = Depends(get_db)) -> tokenSchema.AccessToken:
-    payload = await validate_refresh_token(refresh_token, request.app.state.redis_cli)
+async def refresh_token(request: Request, refresh_token: str, db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis)) -> tokenSchema.AccessToken:
+    payload = await validate_refresh_token(refresh_token, redis_cli)
     access_token = await create_access_token(
         data=payload,
-        redis_cli=request.app.state.redis_cli
+        redis_cli=redis_cli
     )
     return tokenSchema.AccessToken(access_token=access_token, token_type='bearer')
@@ -1,6 +1,7 @@
 from asyncio import gather
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import ValidationError
 import jwt
 
@@ -8,10 +9,12 @@ import jwt
 from datetime import datetime, timedelta, timezone
 
 from ..config import ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, REFRESH_TOKEN_EXPIRE_DAYS, SECRET_KEY,oauth2_scheme
-from .. import models, utils
+from .. import auth_cache, models, utils
 from ..database import get_db
+from .. import token_store
+from ..token_store import get_redis
 from typing import Annotated, Dict
-from redis import Redis
+from redis.asyncio import Redis
 
 # [*] not decalred in our model
 # async def get_current_active_user(
@@ -27,7 +30,7 @@ async def generate_tokens(data: dict, redis_cli: Redis):
     access_token, refresh_token = await gather(encode_to_access_task, encode_to_refresh_task)
 
     # Store In Redis
-    store_in_redis(redis_cli, data.get('id'), access_token, refresh_token)
+    await token_store.store_tokens(redis_cli, data.get('id'), access_token, refresh_token)
     return access_token, refresh_token
 
 
@@ -43,42 +46,34 @@ async def __encode_to_refresh(data: dict):
     payload.update({"exp": expire})
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
-async def store_in_redis(redis_cli, id, access_token, refresh_token) -> None:
-    access_token_name = f"{id}:access_token:{access_token}"
-    refresh_token_name = f"{id}:refresh_token:{refresh_token}"
-
-    pipeline = redis_cli.pipeline()
-
-    pipeline.setex(name=access_token_name, value='', time=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    pipeline.setex(name=refresh_token_name, value='', time=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
-
-    pipeline.execute()
-    return 
-
 async def validate_refresh_token(refresh_token: str, r: Redis) -> Dict | None:
     """
     decode then check refresh token expirations, return payload or raise an exception.
     """ 
     try:
-        if not r.keys(f'*{refresh_token}'):
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired or invalid")
         payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+        if not await token_store.token_exists(r, refresh_token, payload.get('id')):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired or invalid")
         return payload
     except jwt.PyJWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
-async def authenticate_user(db: Session, email: str, password: str) -> bool | models.User  :
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> bool | models.User  :
     """
     return False if the given credintailas are wrong
     """
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await db.scalar(select(models.User).where(models.User.email == email))
 
-    if not user or not utils.verify_password(password, user.password):
+    if not user or not await utils.verify_password(password, user.password):
         return False
     
     return user
 
-async def get_user_from_token(token: Annotated[str, Depends(oauth2_scheme)], db: Annotated[Session, Depends(get_db)]):
+async def get_user_from_token(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+    redis_cli: Annotated[Redis, Depends(get_redis)],
+):
     """
     check access token validation, then return user of the token.
     """
@@ -87,23 +82,32 @@ async def get_user_from_token(token: Annotated[str, Depends(oauth2_scheme)], db:
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # steady state: token already validated by this worker recently
+    if (user := auth_cache.get(token)) is not None:
+        return user
+
     try:
+        # Decode JWT token (local, no IO)
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
         # Check if token is valid in Redis cache
-        in_redis = await check_token_in_redis(token)
+        in_redis = await check_token_in_redis(token, redis_cli, payload.get('id'))
         if not in_redis:
             raise credentials_exception
-        
-        # Decode JWT token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
 
         email: str = payload.get("email")
 
         # Fetch user from database
-        user = db.query(models.User).filter(models.User.email == email).first()
+        user = await db.scalar(select(models.User).where(models.User.email == email))
 
         if user is None:
             raise credentials_exception
-        
+
+        # end read transaction, connection back to pool while handler run (e.g. page computed on its own session)
+        # session still usable (take connection again on next query), user not expired (expire_on_commit=False)
+        await db.commit()
+
+        auth_cache.put(token, user, payload["exp"])
         return user
 
     except jwt.InvalidTokenError:
@@ -113,13 +117,11 @@ async def get_user_from_token(token: Annotated[str, Depends(oauth2_scheme)], db:
         raise e
     
     
-async def check_token_in_redis(token: str) -> bool:
+async def check_token_in_redis(token: str, redis_cli: Redis, id=None) -> bool:
     """
     Check if token exists in Redis.
     """  
-    from app.main import app
-    redis_cli: Redis = app.state.redis_cli
-    return bool(redis_cli.keys(f"*:{token}"))
+    return await token_store.token_exists(redis_cli, token, id)
 
 
 async def create_access_token(data: dict, redis_cli: Redis) -> str:
@@ -133,8 +135,7 @@ async def create_access_token(data: dict, redis_cli: Redis) -> str:
     token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
     # # [2] Store In Redis
-    name=f"{data.get('id')}:access_token:{token}"
-    redis_cli.setex(name=name, value='', time=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    await token_store.store_access_token(redis_cli, data.get('id'), token)
  
     return token
 
@@ -146,7 +147,6 @@ async def create_refresh_token(data: dict, redis_cli: Redis) -> str:
     token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
     
     # Store In Redis
-    name=f"{data.get('id')}:refresh_token:{token}"
-    redis_cli.setex(name=name, value='', time=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+    await token_store.store_refresh_token(redis_cli, data.get('id'), token)
 
     return token
\ No newline at end of file
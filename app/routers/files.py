@@ -1,19 +1,49 @@
-import random
-from fastapi import Depends, HTTPException,  status, APIRouter, UploadFile, File
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from app.config import UPLOAD_DIR
-
-from .. import models
+import logging
+from fastapi import Depends, HTTPException, Request,  status, APIRouter, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import FILE_CACHE_CONTROL, MULTIPART_MAX_PARTS, STAGING_DIR, UPLOAD_MAX_SIZE
+
+from .. import models, multipart
 from ..database import get_db
+from ..downloads import file_response
+from ..storage import ingest_file, object_key, release_blob, store_upload, sweep_blob
+from ..storage_backends import LocalStorage, get_storage
+from ..token_store import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+FORM_OVERHEAD = 64 * 1024 # multipart boundaries and part headers around the file bytes
+
 
+class SizeLimitedRoute(APIRoute):
+    """
+    reject body announced larger than UPLOAD_MAX_SIZE (Content-Length) with 413 before any byte is read,
+    the multipart form is parsed (spooled to disk) before dependencies and handler run.
+    chunked bodies (no Content-Length) still stopped by the size check while hashing.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
 
-from pathlib import Path
+        async def limited_handler(request: Request):
+            length = request.headers.get("content-length")
+            if UPLOAD_MAX_SIZE and length and length.isdigit() and int(length) > UPLOAD_MAX_SIZE + FORM_OVERHEAD:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"file larger than {UPLOAD_MAX_SIZE} bytes")
+            return await handler(request)
+
+        return limited_handler
 
 
 router = APIRouter(
     prefix="/files",
-    tags=["Files"]
+    tags=["Files"],
+    route_class=SizeLimitedRoute,
 )
 
 def cutter_file(file: str):
@@ -28,43 +58,131 @@ def cutter_file(file: str):
 
 
 @router.post("/uploadfile/")
-async def upload_file(uploaded_file: UploadFile, db: Session = Depends(get_db)):
-    file_content = await uploaded_file.read()
-
-    file_name, file_ext = cutter_file(uploaded_file.filename)
+async def upload_file(uploaded_file: UploadFile, db: AsyncSession = Depends(get_db), cache_control: str | None = None):
+    cutter_file(uploaded_file.filename)
 
-    save_to = UPLOAD_DIR / f"{file_name}{file_ext}"
+    # content-addressed: same content stored once, repeated upload only add a metadata row
+    size, checksum, deduplicated = await store_upload(db, uploaded_file)
 
-    # Simple Condtion
-    if save_to.exists():
-        save_to = UPLOAD_DIR / f"{file_name}_{random.randint(0, 15000)}{file_ext}"
-        
-        
-    with open(save_to, 'wb') as file:
-        file.write(file_content)
-    
     db_file = models.File(
-        filename=f'{file_name}{file_ext}',
-        dir=str(save_to)
+        filename=uploaded_file.filename,
+        sha256=checksum,
+        cache_control=cache_control
     )
     
     db.add(db_file)
-    db.commit()
+    await db.commit()
+
+    return {"message": "Upload successful", "file_id": db_file.id, "size": size, "sha256": checksum, "deduplicated": deduplicated}
+
+
+# Resumable Upload: initiate -> PUT parts (parallel, retry any) -> complete
+
+class InitiateUpload(BaseModel):
+    filename: str
+    cache_control: str | None = None
+
+
+@router.post("/uploads", status_code=status.HTTP_201_CREATED)
+async def initiate_upload(payload: InitiateUpload, redis_cli: Redis = Depends(get_redis)):
+    cutter_file(payload.filename) # validate name before receive any data
+    upload_id = await multipart.initiate(redis_cli, payload.filename, payload.cache_control)
+    return {"upload_id": upload_id, "max_parts": MULTIPART_MAX_PARTS}
+
+
+@router.put("/uploads/{upload_id}/parts/{part_number}")
+async def upload_part(upload_id: str, part_number: int, request: Request, redis_cli: Redis = Depends(get_redis)):
+    """
+    raw request body is the part data (not multipart form), streamed to disk.
+    """
+    size, checksum = await multipart.upload_part(redis_cli, upload_id, part_number, request.stream())
+    return {"part_number": part_number, "size": size, "sha256": checksum}
+
+
+@router.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str, redis_cli: Redis = Depends(get_redis)):
+    """
+    uploaded parts so far, client resume by sending the missing ones.
+    """
+    session = await multipart.get_session(redis_cli, upload_id)
+    return {"upload_id": upload_id, "filename": session["filename"], "parts": await multipart.list_parts(redis_cli, upload_id)}
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str, db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis)):
+    session = await multipart.get_session(redis_cli, upload_id)
+    assemble_to = STAGING_DIR / upload_id
+
+    filename, _ = await multipart.complete(redis_cli, upload_id, assemble_to)
+    try:
+        size, checksum, deduplicated = await ingest_file(db, assemble_to)
+    except BaseException:
+        await run_in_threadpool(assemble_to.unlink, True) # parts still there, complete can be retried
+        raise
+
+    db_file = models.File(
+        filename=filename,
+        sha256=checksum,
+        cache_control=session.get("cache_control")
+    )
+    db.add(db_file)
+    await db.commit()
+    await multipart.abort(redis_cli, upload_id) # parts removed only once the file is committed
+
+    return {"message": "Upload successful", "file_id": db_file.id, "size": size, "sha256": checksum, "deduplicated": deduplicated}
+
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload(upload_id: str, redis_cli: Redis = Depends(get_redis)):
+    await multipart.get_session(redis_cli, upload_id)
+    await multipart.abort(redis_cli, upload_id)
 
-    return {"message": "Upload successful", "file_id": db_file.id}
 
 @router.get("/{file_id}")
-async def get_file(file_id: int, db: Session = Depends(get_db)):
+async def get_file(file_id: int, request: Request, db: AsyncSession = Depends(get_db)):
     """
     Downloads a file by its ID.
+    support Range (resume / seek), and conditional requests (If-None-Match / If-Modified-Since -> 304).
     """
-    db_file = db.query(models.File).filter(models.File.id == file_id).first()
+    db_file = await db.get(models.File, file_id)
 
     if db_file is None:
         raise HTTPException(status_code=404, detail="File not found")
 
-    file_path = Path(db_file.dir)
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found on disk")
+    cache_control = db_file.cache_control or FILE_CACHE_CONTROL
+    storage = get_storage()
+
+    # shared object storage: client download directly from it, app workers not stream any byte
+    if not isinstance(storage, LocalStorage):
+        url = await storage.presigned_url(object_key(db_file.sha256), db_file.filename, cache_control)
+        return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT, headers={"Cache-Control": "no-store"})
+
+    return await file_response(
+        request,
+        storage,
+        object_key(db_file.sha256),
+        filename=db_file.filename,
+        etag=f'"{db_file.sha256}"', # content-addressed, hash is the strong validator
+        last_modified=db_file.created_at,
+        cache_control=cache_control,
+    )
+
+
+@router.delete("/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_file(file_id: int, db: AsyncSession = Depends(get_db)):
+    db_file = await db.get(models.File, file_id)
+    if db_file is None:
+        raise HTTPException(status_code=404, detail="File not found")
 
-    return FileResponse(file_path, headers={"Content-Disposition": f"attachment; filename={db_file.filename}", "Content-Type": "application/octet-stream"})
\ No newline at end of file
+    await db.delete(db_file)
+    await db.flush() # files row gone before blob row (foreign key)
+    unreferenced = await release_blob(db, db_file.sha256)
+    await db.commit()
+
+    # content removed only when no other file point to it, after commit (failed commit keep rows and content),
+    # under the blob row lock in its own transaction. failure left the zero-ref blob to the periodic sweep
+    if unreferenced:
+        try:
+            await sweep_blob(db, db_file.sha256)
+        except Exception:
+            logger.exception("removing content %s failed, left to the periodic sweep", db_file.sha256)
@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import feed, models
+from app.database import get_db
+from app.routers.auth_utils import get_user_from_token
+from app.token_store import get_redis
+
+
+router = APIRouter(prefix="/follows", tags=["Follows"])
+
+class Follow(BaseModel):
+    user_id: int # account to follow
+
+
+@router.post("", status_code=status.HTTP_201_CREATED)
+async def follow(payload: Follow, user: models.User = Depends(get_user_from_token), db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis)):
+    if payload.user_id == user.id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="can't follow yourself")
+
+    followed = await db.get(models.User, payload.user_id)
+    if not followed:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"user with id {payload.user_id} doesn't exisit")
+
+    # single statement, duplicate follow return no row instead of raising
+    inserted = await db.scalar(
+        insert(models.Follow).values(follower_id=user.id, followed_id=payload.user_id) \
+        .on_conflict_do_nothing() \
+        .returning(models.Follow.followed_id)
+    )
+    if inserted is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"user {user.id} already follow user {payload.user_id}")
+
+    # keep denormalized counter in same transaction (decide fan-out-on-write or on-read)
+    await db.execute(update(models.User).where(models.User.id == payload.user_id).values(followers_count=models.User.followers_count + 1))
+    await db.commit()
+
+    await feed.on_follow(db, redis_cli, user.id, followed)
+    return {"message": f"Successfully followed user {payload.user_id}"}
+
+
+@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def unfollow(user_id: int, user: models.User = Depends(get_user_from_token), db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis)):
+    deleted = await db.scalar(
+        delete(models.Follow) \
+        .where(models.Follow.follower_id == user.id, models.Follow.followed_id == user_id) \
+        .returning(models.Follow.followed_id)
+    )
+    if deleted is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"user {user.id} not following user {user_id}")
+
+    await db.execute(update(models.User).where(models.User.id == user_id).values(followers_count=models.User.followers_count - 1))
+    await db.commit()
+
+    await feed.on_unfollow(db, redis_cli, user.id, user_id)
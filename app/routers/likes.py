@@ -1,10 +1,17 @@
+from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from pydantic import BaseModel, Field
+from redis.asyncio import Redis
+from sqlalchemy import delete, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import models
+from app import like_buffer, models, response_cache
+from app.config import LIKES_BULK_MAX_POSTS, LIKES_WRITE_BEHIND
 from app.database import get_db
 from app.routers.auth_utils import get_user_from_token
+from app.token_store import get_redis
 
 
 router = APIRouter(prefix="/likes", tags=["Likes"])
@@ -13,34 +20,105 @@ class Like(BaseModel):
     post_id: int
     type_click: bool
 
+class BulkLike(BaseModel):
+    post_ids: List[int] = Field(min_length=1, max_length=LIKES_BULK_MAX_POSTS)
+    type_click: bool
+
+
+# One Round-Trip Like / Unlike
+# [*] likes insert/delete and like_count update in ONE statement (data-modifying CTE), counter only move when a row really changed.
+# [*] like: ON CONFLICT DO NOTHING -> no row returned = already liked, FK violation = post doesn't exist (no pre-check SELECT).
+# [*] unlike: DELETE ... RETURNING -> no row returned = not liked before.
+
+def _like_stmt(user_id: int, post_ids: List[int] | None = None, post_id: int | None = None):
+    if post_ids is None:
+        inserted = insert(models.Likes).values(user_id=user_id, post_id=post_id)
+    else:
+        # bulk: insert from posts, missing posts skipped instead of failing whole batch on FK
+        inserted = insert(models.Likes).from_select(
+            ['user_id', 'post_id'],
+            select(literal(user_id), models.Post.id).where(models.Post.id.in_(post_ids)),
+        )
+    inserted = inserted.on_conflict_do_nothing().returning(models.Likes.post_id).cte('inserted')
+    return update(models.Post) \
+            .where(models.Post.id.in_(select(inserted.c.post_id))) \
+            .values(like_count=models.Post.like_count + 1) \
+            .returning(models.Post.id)
+
+
+def _unlike_stmt(user_id: int, post_ids: List[int]):
+    deleted = delete(models.Likes) \
+            .where(models.Likes.user_id == user_id, models.Likes.post_id.in_(post_ids)) \
+            .returning(models.Likes.post_id) \
+            .cte('deleted')
+    return update(models.Post) \
+            .where(models.Post.id.in_(select(deleted.c.post_id))) \
+            .values(like_count=models.Post.like_count - 1) \
+            .returning(models.Post.id)
+
+
 # payload -> post_id + delete or make like
 @router.post("", status_code=status.HTTP_201_CREATED)
-async def like(payload: Like, user: models.User = Depends(get_user_from_token), db: Session = Depends(get_db)):
-    
-    # is Post There ?
-    if not db.query(models.Post).filter(models.Post.id == payload.post_id).first():
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"post with in id {payload.post_id} doesn't exisit")
-    
-    post = db.query(models.Likes).filter(models.Likes.post_id == payload.post_id, models.Likes.user_id == user.id)
-    
+async def like(payload: Like, user: models.User = Depends(get_user_from_token), db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis)):
+
+    if LIKES_WRITE_BEHIND:
+        return await _buffered_like(payload, user, db, redis_cli)
 
     if payload.type_click: # do like
-        if post.first(): # is doing like before ?
+        try:
+            changed = await db.scalar(_like_stmt(user.id, post_id=payload.post_id))
+        except IntegrityError: # likes.post_id FK, post not there
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"post with in id {payload.post_id} doesn't exisit")
+
+        if changed is None: # is doing like before ?
+            await db.rollback()
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"user {user.id} is already liked on the post {payload.post_id}")
-        
-        # apply like on the post
-        like_query = models.Likes(post_id=payload.post_id, user_id=user.id)
-        db.add(like_query)
-        db.commit()
+
+        await db.commit()
+        await response_cache.invalidate_post(redis_cli, payload.post_id) # cached pages showing its like count
         return {"message" : "Successfully Liked in the post"}
 
 
-    if not post.first(): # is liked before in the post ?
+    changed = await db.scalar(_unlike_stmt(user.id, [payload.post_id]))
+    if changed is None: # is liked before in the post ?
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"user {user.id} not liked on the post {payload.post_id} before")
-    
-    # delete like from the post
-    post.delete(synchronize_session=False)
-    db.commit()
+
+    await db.commit()
+    await response_cache.invalidate_post(redis_cli, payload.post_id)
     return {"message" : "Successfully deleted Like"}
-    
-    
+
+
+async def _buffered_like(payload: Like, user: models.User, db: AsyncSession, redis_cli: Redis):
+    # write-behind mode: recorded in redis, same responses as direct mode
+    changed, missing = await like_buffer.record(db, redis_cli, user.id, [payload.post_id], payload.type_click)
+    if missing:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"post with in id {payload.post_id} doesn't exisit")
+    if not changed and payload.type_click:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"user {user.id} is already liked on the post {payload.post_id}")
+    if not changed:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"user {user.id} not liked on the post {payload.post_id} before")
+
+    await response_cache.invalidate_post(redis_cli, payload.post_id)
+    return {"message" : "Successfully Liked in the post" if payload.type_click else "Successfully deleted Like"}
+
+
+@router.post("/bulk")
+async def bulk_like(payload: BulkLike, user: models.User = Depends(get_user_from_token), db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis)):
+    """
+    like / unlike many posts in one statement, posts already in wanted state (or missing) reported as skipped.
+    """
+    post_ids = sorted(set(payload.post_ids)) # same lock order for concurrent batches
+    if LIKES_WRITE_BEHIND:
+        changed = set((await like_buffer.record(db, redis_cli, user.id, post_ids, payload.type_click))[0])
+    else:
+        stmt = _like_stmt(user.id, post_ids=post_ids) if payload.type_click else _unlike_stmt(user.id, post_ids)
+        changed = set((await db.scalars(stmt)).all())
+        await db.commit()
+
+    await response_cache.invalidate_posts(redis_cli, list(changed))
+    return {
+        "changed": sorted(changed),
+        "skipped": [id for id in post_ids if id not in changed],
+    }
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+
+from .. import auth_cache, database, like_buffer, like_counter, response_cache, utils
+
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+# Counters of each subsystem, for monitoring (scrape it periodically)
+@router.get('')
+async def get_metrics() -> dict:
+    return {
+        "password_hashing": utils.hashing_stats(),
+        "auth_cache": auth_cache.cache_stats(),
+        "response_cache": response_cache.cache_stats(),
+        "like_counter": like_counter.like_counter_stats(),
+        "like_buffer": like_buffer.like_buffer_stats(),
+        "db_pool": database.pool_stats(),
+        "db_replicas": database.replica_stats(), # host -> healthy
+    }
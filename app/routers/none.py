@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated, Any
-from redis import Redis
+from redis.asyncio import Redis
 
 from app import models
+from app.config import USERS_MAX_PER_PAGE
 from app.database import get_db, Base
 # from ..main import redis_connection
 
@@ -12,11 +14,12 @@ router = APIRouter(prefix="/none",tags=['None'])
 
 # Fastapi Convert Object Model Automatically ? Yes Even Without Pydantic [Not All Cause, Convert When only use One Model in query method]
 @router.get('/')
-async def is_convert(db: Session = Depends(get_db)):
-    query = db.query(models.User).all()
+async def is_convert(db: AsyncSession = Depends(get_db)):
+    # never load whole table, count in sql + first users only (all of them: /users/export)
+    query = (await db.scalars(select(models.User).order_by(models.User.id).limit(USERS_MAX_PER_PAGE))).all()
 
     response = {
-        "count": len(query),
+        "count": await db.scalar(select(func.count(models.User.id))),
         "users": query
     }
     return response
@@ -30,6 +33,6 @@ async def stuff():
 
 from app import utils
 @router.get('/redis-connecting')
-async def redis_is_connection(request: Request, db: Session = Depends(get_db)):
+async def redis_is_connection(request: Request, db: AsyncSession = Depends(get_db)):
     return ''
 
@@ -1,13 +1,21 @@
 import asyncio
 from functools import cache
 from typing import Annotated
-from fastapi import Depends, HTTPException,  status, APIRouter
-from sqlalchemy import desc, func
-from sqlalchemy.orm import Session
+from fastapi import BackgroundTasks, Depends, HTTPException, Request, Response,  status, APIRouter
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from redis.asyncio import Redis
 
 from app.routers.auth_utils import get_user_from_token
 from .. import models
-from ..database import get_db
+from ..database import get_db, read_session
+from .. import feed, like_buffer, post_import, response_cache
+from ..export import ExportFormat, export_response
+from ..responses import model_response
+from ..config import POSTS_COUNT_STRATEGY
+from ..pagination import WITH_AUTHOR, paginate_by_cursor, paginate_by_offset
+from ..search import search_filters, search_order
+from ..token_store import get_redis
 from ..schemas.postSchemas import  *
 
 router = APIRouter(
@@ -17,141 +25,148 @@ router = APIRouter(
 
 
 
-@router.get('')
-async def search_on_posts(user: models.User = Depends(get_user_from_token),db: Session = Depends(get_db), q:str = '', page: int = 1, per_page: int = 5) -> PostsLinePaginator:
-    count = db.query(models.Post.id).where(models.Post.content.contains(q)).count()
-    if not count:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No Posts")
-    
-    no_pages = count // per_page + (1 if count % per_page else 0) # 32 // 10 = 3 + is still has data ? yes then + 1 : no then + 0 => 4
-    
-    if page > no_pages or page < 1: # Here Should at leaset the page = 1
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'page {page} out of range.')
+def default_count_strategy(count_strategy: CountStrategy | None = None) -> CountStrategy:
+    """
+    dependency, per request override of the configured count strategy.
+    """
+    return count_strategy or CountStrategy(POSTS_COUNT_STRATEGY)
+
 
-    skip: int = ( page - 1 ) * per_page
+async def with_buffered_likes(redis_cli: Redis, page: PostsLinePaginator) -> PostsLinePaginator:
+    # write-behind likes mode: add likes not flushed to postgres yet (no-op otherwise)
+    await like_buffer.merge_counts(redis_cli, page.result)
+    return page
+
+
+@router.get('', response_model=PostsLinePaginator)
+async def search_on_posts(user: models.User = Depends(get_user_from_token), redis_cli: Redis = Depends(get_redis), q:str = '', page: int = 1, per_page: int = 5, use_cursor: bool = False, cursor: str | None = None, count_strategy: CountStrategy = Depends(default_count_strategy)) -> Response:
+    filters = search_filters(q) # full-text, uses GIN index
 
     # return List of Tuples Contain Post Object & no_likes int value
-    posts = db.query(models.Post, func.count(models.Likes.user_id)) \
-            .outerjoin(models.Likes, models.Post.id == models.Likes.post_id) \
-            .where(models.Post.content.contains(q)) \
-            .group_by(models.Post.id)\
-            .order_by(desc(models.Post.created_at)) \
-            .limit(per_page) \
-            .offset(skip) \
-            .all()
-
-    # Convert Each Tuple into dict then validate it via creating Pydantic Object to make it serializable.
-    posts_pydantic = [PostLine(**dict(zip(['post', 'no_likes'], post))) for post in posts]
-    
-    pagination = {
-        "count" : count,
-        "current_page" : page,
-        "has_next": page != no_pages,
-        "has_pre": page != 1, # Other Cases All Handel it Before Reach Here.
-        "no_pages": no_pages
-    }
-    return PostsLinePaginator(result=posts_pydantic, **pagination)
-
-@router.get('/me')
-async def get_all_me_posts(user: models.User = Depends(get_user_from_token), db: Session = Depends(get_db), q: str='', page: int = 1, per_page: int = 5) -> PostsLinePaginator:
-    count = db.query(models.Post.id).filter(models.Post.user_id == user.id, models.Post.title.contains(q)).count()
-    if not count:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Still Doesn't has any Posts")
-    
-    no_pages = count // per_page + (1 if count % per_page else 0)
-    if page > no_pages or page < 1: 
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'page {page} out of range.')
-    
-    skip: int = ( page - 1 ) * per_page
-    
-    posts = db.query(models.Post, func.count(models.Likes.user_id)) \
-            .outerjoin(models.Likes, models.Post.id == models.Likes.post_id) \
-            .where(models.Post.user_id == user.id, models.Post.title.contains(q)) \
-            .group_by(models.Post.id) \
-            .order_by(desc(models.Post.created_at)) \
-            .limit(per_page) \
-            .offset(skip) \
-            .all()
-
-    posts_pydantic: List[PostLine] = [PostLine(**dict(zip(['post', 'no_likes'], post))) for post in posts]
-    pagination = {
-        "count" : count,
-        "current_page" : page,
-        "has_next": page != no_pages,
-        "has_pre": page != 1,
-        "no_pages": no_pages
-    }
-    
-    return PostsLinePaginator(result=posts_pydantic, **pagination)
+    # [*] no_likes read from denormalized posts.like_count, no JOIN / GROUP BY over likes
+    # [*] WITH_AUTHOR: post.user joined in the same statement, no query per post
+    stmt = select(models.Post, models.Post.like_count) \
+            .where(*filters) \
+            .options(WITH_AUTHOR)
 
-@router.get('/time-line')
-async def get_posts_time_line(user: Annotated[models.User, Depends(get_user_from_token)], db: Session = Depends(get_db), q:str = '', page: int = 1, per_page: int = 10) -> PostsLinePaginator:  
-    count: int = db.query(models.Post.id).count()
-    if not count:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'no posts')
-    
-    no_pages = (count // per_page) + (1 if count % per_page != 0 else 0)
-    if page > no_pages or page < 1:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'page {page} out of range.')
-    
-    skip: int = (page - 1) * per_page
+    # [*] same results for every user, cached in redis. session (replica) opened only on cache miss,
+    # [*] auth released its connection already, so a miss hold one connection only
+    async def compute() -> PostsLinePaginator:
+        async with read_session() as db:
+            # Opt-in: keyset pagination, pass use_cursor=true for first page then next_cursor/prev_cursor
+            # [*] cursor walk by (created_at, id), so matched posts come newest first instead of ranked
+            if use_cursor or cursor:
+                return await with_buffered_likes(redis_cli, await paginate_by_cursor(db, stmt, per_page, cursor))
 
+            return await with_buffered_likes(redis_cli, await paginate_by_offset(db, redis_cli, stmt, filters, page, per_page, count_strategy, empty_detail="No Posts", order_by=search_order(q)))
 
+    params = {"q": q, "page": page, "per_page": per_page, "use_cursor": use_cursor, "cursor": cursor, "count_strategy": count_strategy.value}
+    return await response_cache.cached_page(redis_cli, 'search', params, compute)
 
-# Keys used in pydantic and values for db query
-    fields = {
-        'post' : models.Post,
-        'no_likes': func.count(models.Likes.user_id).label('no_like')
-    }
-    
-    # Fetch Posts
-    posts = db.query(*fields.values()) \
-            .outerjoin(models.Likes, models.Post.id == models.Likes.post_id) \
-            .join(models.User, models.Post.user_id == models.User.id) \
-            .group_by(models.Post.id, models.User.id) \
-            .order_by(desc(models.Post.created_at)) \
-            .limit(per_page) \
-            .offset(skip) \
-            .all()
-    
-    # corresponding values of post with fields via zip function, then convert it to dict, then unpack the dict to pass it to PostLine Object Model
-    posts_pydantic = [PostLine(**dict(zip(fields.keys(), post))) for post in posts]
+@router.get('/me', response_model=PostsLinePaginator)
+async def get_all_me_posts(user: models.User = Depends(get_user_from_token), db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis), q: str='', page: int = 1, per_page: int = 5, use_cursor: bool = False, cursor: str | None = None, count_strategy: CountStrategy = Depends(default_count_strategy)) -> Response:
+    filters = [models.Post.user_id == user.id, *search_filters(q)]
 
-    
-    return PostsLinePaginator(
-        result=posts_pydantic,
-        count=count,
-        no_pages=no_pages,
-        current_page=page, 
-        has_next=page != no_pages, 
-        has_pre=page > 1)
-
-@router.get('/{id}')
-async def get_post(id: int, user: models.User = Depends(get_user_from_token), db: Session = Depends(get_db)) -> PostLine:
-    post : dict | None = db.query(models.Post, func.count(models.Likes.user_id).label('no_likes')) \
-    .join(models.Likes, models.Post.id == models.Likes.post_id) \
-    .where(models.Post.id == id) \
-    .group_by(models.Post.id) \
-    .first()
+    stmt = select(models.Post, models.Post.like_count) \
+            .where(*filters) \
+            .options(WITH_AUTHOR)
+
+    if use_cursor or cursor:
+        return model_response(await with_buffered_likes(redis_cli, await paginate_by_cursor(db, stmt, per_page, cursor)))
+
+    return model_response(await with_buffered_likes(redis_cli, await paginate_by_offset(db, redis_cli, stmt, filters, page, per_page, count_strategy, empty_detail="Still Doesn't has any Posts", order_by=search_order(q))))
+
+@router.get('/time-line', response_model=PostsLinePaginator)
+async def get_posts_time_line(user: Annotated[models.User, Depends(get_user_from_token)], redis_cli: Redis = Depends(get_redis), q:str = '', page: int = 1, per_page: int = 10, use_cursor: bool = False, cursor: str | None = None, count_strategy: CountStrategy = Depends(default_count_strategy)) -> Response:  
+    # Fetch Posts
+    stmt = select(models.Post, models.Post.like_count) \
+            .options(WITH_AUTHOR)
+
+    # [*] hot pages served from redis, postgres touched only on cache miss (and auth cache miss)
+    async def compute() -> PostsLinePaginator:
+        async with read_session() as db:
+            if use_cursor or cursor:
+                return await with_buffered_likes(redis_cli, await paginate_by_cursor(db, stmt, per_page, cursor))
+
+            # no filters, whole table (count strategies can use table statistics)
+            return await with_buffered_likes(redis_cli, await paginate_by_offset(db, redis_cli, stmt, [], page, per_page, count_strategy, empty_detail='no posts'))
+
+    params = {"page": page, "per_page": per_page, "use_cursor": use_cursor, "cursor": cursor, "count_strategy": count_strategy.value}
+    return await response_cache.cached_page(redis_cli, 'time-line', params, compute)
+
+@router.get('/feed', response_model=PostsLinePaginator)
+async def get_home_feed(user: models.User = Depends(get_user_from_token), db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis), per_page: int = 10, cursor: str | None = None) -> Response:
+    # personal time-line: posts of followed accounts (and own), newest first, cursor = next_cursor of previous page
+    if per_page < 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="per_page should be at least 1")
+    before = feed.decode_cursor(cursor) if cursor else None
+
+    entries = await feed.read_feed(db, redis_cli, user.id, per_page + 1, before)
+    has_next = len(entries) > per_page
+    entries = entries[:per_page]
+    rows = await feed.hydrate(db, [id for id, _ in entries])
+
+    return model_response(await with_buffered_likes(redis_cli, PostsLinePaginator(
+        result=[PostLine.model_validate(row, from_attributes=True) for row in rows],
+        count_strategy=CountStrategy.none,
+        has_next=has_next,
+        has_pre=before is not None,
+        next_cursor=feed.encode_cursor(entries[-1][1], entries[-1][0]) if entries and has_next else None,
+    )))
+
+@router.get('/export')
+async def export_posts(user: models.User = Depends(get_user_from_token), format: ExportFormat = ExportFormat.ndjson):
+    # streamed, constant memory whatever number of posts
+    stmt = select(
+        models.Post.id, models.Post.title, models.Post.content, models.Post.published,
+        models.Post.created_at, models.Post.user_id, models.Post.like_count,
+    ).order_by(models.Post.id)
+    return export_response(stmt, format, 'posts')
+
+@router.get('/{id}', response_model=PostLine)
+async def get_post(id: int, user: models.User = Depends(get_user_from_token), db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis)) -> Response:
+    post : dict | None = (await db.execute(
+        select(models.Post, models.Post.like_count) \
+        .where(models.Post.id == id) \
+        .options(WITH_AUTHOR)
+    )).first()
     if post is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"post with id {id} doesn't exisit")
     
-    return PostLine(**dict(zip(['post', 'no_likes'], post)))
+    post_line = PostLine.model_validate(post, from_attributes=True)
+    await like_buffer.merge_counts(redis_cli, [post_line])
+    return model_response(post_line)
 
 @router.post('',status_code=status.HTTP_201_CREATED)
-async def create_post(payload: CreatePostSchema, user: models.User = Depends(get_user_from_token), db: Session = Depends(get_db)) -> CreatePostResponseSchema:
+async def create_post(payload: CreatePostSchema, background_tasks: BackgroundTasks, user: models.User = Depends(get_user_from_token), db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis)) -> CreatePostResponseSchema:
     new_post = models.Post(**payload.model_dump(),user_id=user.id) # create Object Model
     db.add(new_post) # Do INSERT operation for Object Model
-    db.commit() 
-    db.refresh(new_post) # like returning, get the inserted post and fill the other values that fill it from DB like id, created_at
+    await db.commit() 
+    await db.refresh(new_post) # like returning, get the inserted post and fill the other values that fill it from DB like id, created_at
+    await response_cache.invalidate_all(redis_cli) # every listing page shifted
+    background_tasks.add_task(feed.fan_out, new_post.user_id, new_post.id, new_post.created_at) # push to followers feeds after response
     return new_post
 
 
+@router.post('/import')
+async def import_posts(request: Request, user: models.User = Depends(get_user_from_token), db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis), format: ImportFormat | None = None) -> PostImportResult:
+    # bulk load (migrations), body streamed as NDJSON or CSV (format param, else from Content-Type), rows owned by current user
+    # [*] imported posts not pushed into follower feeds (bulk migration of old posts, no fan-out storm),
+    # [*] followers only get them from the postgres pull, when their pushed feed window doesn't fill the page
+    if format is None:
+        format = ImportFormat.csv if request.headers.get('content-type', '').startswith('text/csv') else ImportFormat.ndjson
+
+    rows = post_import.csv_rows(request.stream()) if format == ImportFormat.csv else post_import.ndjson_rows(request.stream())
+    result = await post_import.import_posts(db, user.id, rows)
+    if result.imported:
+        await response_cache.invalidate_all(redis_cli)
+    return result
+
+
 @router.patch('/{id}',status_code=status.HTTP_202_ACCEPTED, )
-async def update_post(id: int, payload: UpdatePostSchema, user: models.User = Depends(get_user_from_token), db: Session = Depends(get_db)) -> UpdatePostResponseSchema:
+async def update_post(id: int, payload: UpdatePostSchema, user: models.User = Depends(get_user_from_token), db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis)) -> UpdatePostResponseSchema:
     
-    post_query = db.query(models.Post).filter(models.Post.id == id) # Store The Query not Execution
-    post: models.Post | None = post_query.first() # First Call, [Execution]
+    post: models.Post | None = await db.get(models.Post, id) # [Execution]
 
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail=f"post with id {id} doesn't exisit")
@@ -159,17 +174,18 @@ async def update_post(id: int, payload: UpdatePostSchema, user: models.User = De
     if post.user_id != user.id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"unauthorized to do this action")
     
-    post_query.update({**payload.model_dump()},synchronize_session=False) # Execution Update Query
-    db.commit() # Save All Things
+    await db.execute(update(models.Post).where(models.Post.id == id).values(**payload.model_dump())) # Execution Update Query
+    await db.commit() # Save All Things
+    await db.refresh(post) # reload updated values, session not expire objects on commit
+    await response_cache.invalidate_all(redis_cli) # new title/content may change search matches, not only its own pages
 
     return post
 
 
 #? NOTE: Response 204 Should Don't Send Data Back, This Is The Mechaneciem Of The 204 Response
 @router.delete('/{id}',status_code=status.HTTP_204_NO_CONTENT)
-async def delete_post(id: int, user: models.User = Depends(get_user_from_token), db: Session = Depends(get_db)):
-    post_query = db.query(models.Post).filter(models.Post.id == id)
-    post: models.Post | None = post_query.first()
+async def delete_post(id: int, user: models.User = Depends(get_user_from_token), db: AsyncSession = Depends(get_db), redis_cli: Redis = Depends(get_redis)):
+    post: models.Post | None = await db.get(models.Post, id)
 
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail=f"post with id {id} doesn't exisit")
@@ -177,8 +193,9 @@ async def delete_post(id: int, user: models.User = Depends(get_user_from_token),
     if post.user_id != user.id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"unauthorized to do this action")
     
-    post_query.delete(synchronize_session=False)
-    db.commit()
+    await db.execute(delete(models.Post).where(models.Post.id == id))
+    await db.commit()
+    await response_cache.invalidate_all(redis_cli)
 
 # from time import sleep
 # async def after_insert_listener(mapper, connection, target):
@@ -1,13 +1,17 @@
 from typing import Annotated
 from fastapi import Depends, HTTPException, Request, status, APIRouter
-from redis import Redis
-from sqlalchemy.orm import Session
+from redis.asyncio import Redis
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.routers.auth_utils import get_user_from_token
 
 
-from .. import models, utils
-from ..database import get_db
+from .. import auth_cache, models, utils
+from ..config import USERS_MAX_PER_PAGE
+from ..database import get_db, get_read_db
+from ..export import ExportFormat, export_response
+from ..token_store import get_redis, revoke_user_tokens
 from ..schemas import userSchemas
 
 
@@ -19,46 +23,64 @@ router = APIRouter(
 # Users End-Point
 
 @router.post('', status_code=status.HTTP_201_CREATED, response_model=userSchemas.UserCreateResponse)
-async def create_user(user: Annotated[models.User, Depends(get_user_from_token)], payload: userSchemas.UserCreate,db: Session = Depends(get_db)):
-    if db.query(models.User).filter(models.User.email == payload.email).first():
+async def create_user(user: Annotated[models.User, Depends(get_user_from_token)], payload: userSchemas.UserCreate,db: AsyncSession = Depends(get_db)):
+    if await db.scalar(select(models.User).where(models.User.email == payload.email)):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"user with email {payload.email} already exisit.")
     
-    payload.password = utils.get_password_hash(payload.password)
+    payload.password = await utils.hash_password(payload.password)
 
     user_object = models.User(**payload.model_dump())
     db.add(user_object)
-    db.commit()
-    db.refresh(user_object)
+    await db.commit()
+    await db.refresh(user_object)
     return user_object
 
 @router.patch('/me')
-async def patch_user(request: Request, payload: dict, user: Annotated[models.User, Depends(get_user_from_token)], db: Annotated[Session, Depends(get_db)]):
+async def patch_user(request: Request, payload: dict, user: Annotated[models.User, Depends(get_user_from_token)], db: Annotated[AsyncSession, Depends(get_db)], redis_cli: Annotated[Redis, Depends(get_redis)]):
     if password:= payload.get('password'):
-        payload['password'] = utils.get_password_hash(password)
+        payload['password'] = await utils.hash_password(password)
     
-    db.query(models.User).filter(models.User.email == user.email).update({**payload},synchronize_session=False)
-    db.commit()
-
-    # In Redis, a pipeline is a feature that allows you to send multiple commands to the server without waiting for the replies of each command, thus reducing the latency of round trips. The server executes all commands in sequence and returns all responses at once.
-    redis_cli: Redis = request.app.state.redis_cli
-    tokens = redis_cli.keys(f"{user.id}:*")
-    if tokens:
-        pipeline = redis_cli.pipeline()
-        for token in tokens:
-            pipeline.delete(token)
-        pipeline.execute()
-    return user
+    # updated row returned by the statement: user may be a detached copy from the auth cache (never refreshed by update),
+    # populate_existing refresh it when it is loaded in this session
+    updated = await db.scalar(
+        update(models.User).where(models.User.id == user.id).values(**payload) \
+        .returning(models.User) \
+        .execution_options(populate_existing=True)
+    )
+    await db.commit()
+
+    # force re-login, all issued tokens of the user no longer valid
+    await revoke_user_tokens(redis_cli, user.id)
+    auth_cache.invalidate_user(user.id)
+    return updated
     
 
 @router.get('')
-async def get_all_users(db: Session = Depends(get_db)) -> list[userSchemas.UserResponse]:
-    users = db.query(models.User).all()
-    return users
+async def get_all_users(db: AsyncSession = Depends(get_read_db), page: int = 1, per_page: int = 20) -> userSchemas.UsersPaginator:
+    # paginated, whole table only through /users/export (streamed)
+    if page < 1 or not 1 <= per_page <= USERS_MAX_PER_PAGE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"page should be at least 1 and per_page between 1 and {USERS_MAX_PER_PAGE}")
+
+    users = (await db.scalars(
+        select(models.User).order_by(models.User.id).offset((page - 1) * per_page).limit(per_page + 1) # one extra row -> has_next
+    )).all()
+    return userSchemas.UsersPaginator(
+        current_page=page,
+        has_next=len(users) > per_page,
+        has_pre=page > 1,
+        result=users[:per_page],
+    )
+
+
+@router.get('/export')
+async def export_users(user: Annotated[models.User, Depends(get_user_from_token)], format: ExportFormat = ExportFormat.ndjson):
+    stmt = select(models.User.id, models.User.email, models.User.created_at).order_by(models.User.id)
+    return export_response(stmt, format, 'users')
 
 
 @router.get('/{id}', response_model=userSchemas.UserResponse)
-async def get_user(id: int, db: Session = Depends(get_db)) -> userSchemas.UserResponse:
-    user : dict | None = db.query(models.User).get(id)
+async def get_user(id: int, db: AsyncSession = Depends(get_read_db)) -> userSchemas.UserResponse:
+    user : dict | None = await db.get(models.User, id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"user with id {id} doesn't exisit")
     return user
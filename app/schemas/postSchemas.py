@@ -1,5 +1,6 @@
 from datetime import datetime
-from pydantic import BaseModel, field_validator
+from enum import Enum
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, field_validator
 from . import userSchemas
 from typing import List
 
@@ -45,16 +46,45 @@ class PostResponse(BasePostSchema):
     user: userSchemas.UserResponse
 
 class PostLine(BaseModel):
-    post: PostResponse
-    no_likes: int
+    # built straight from (Post, like_count) result rows: PostLine.model_validate(row, from_attributes=True)
+    model_config = ConfigDict(from_attributes=True)
+
+    post: PostResponse = Field(validation_alias=AliasChoices('post', 'Post'))
+    no_likes: int = Field(validation_alias=AliasChoices('no_likes', 'like_count'))
+
+
+class ImportFormat(str, Enum):
+    ndjson = 'ndjson' # one json object per line
+    csv = 'csv' # header line: title,content[,published]
+
+
+class PostImportError(BaseModel):
+    line: int # line of the row in the body (first line of multi-line csv record)
+    errors: List[str]
+
+
+class PostImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[PostImportError] # first POSTS_IMPORT_MAX_ERRORS only, failed has the total
+
+
+class CountStrategy(str, Enum):
+    exact = 'exact' # COUNT(*) over filtered posts
+    estimated = 'estimated' # planner estimate (pg_class.reltuples / EXPLAIN), approximate
+    cached = 'cached' # exact, but cached in redis for short ttl
+    none = 'none' # no count, has_next from fetching one extra row
 
 
 class PostsLinePaginator(BaseModel):
-    count: int
-    current_page: int
+    count_strategy: CountStrategy | None = None # which strategy produced count / no_pages
+    count: int | None = None # not computed in cursor mode or 'none' strategy
+    current_page: int | None = None
     has_next: bool
     has_pre: bool
-    no_pages: int
+    no_pages: int | None = None
+    next_cursor: str | None = None # cursor mode only, opaque
+    prev_cursor: str | None = None
     result: List[PostLine]
 
 
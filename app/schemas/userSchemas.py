@@ -1,6 +1,7 @@
 # User Schema
 from pydantic import BaseModel, EmailStr, field_validator
 from datetime import datetime
+from typing import List
 
 
 class UserBase(BaseModel):
@@ -43,3 +44,9 @@ class UserCreateResponse(UserBase):
 class UserResponse(UserBase):
     id: int
     created_at: datetime
+
+class UsersPaginator(BaseModel):
+    current_page: int
+    has_next: bool
+    has_pre: bool
+    result: List[UserResponse]
@@ -0,0 +1,34 @@
+from sqlalchemy import desc, func
+
+from . import models
+from .pagination import NEWEST_FIRST
+
+# Full-Text Search On Posts
+# [*] LIKE '%q%' can't use any index, scan whole posts table on every search.
+# [*] posts.search_vector (generated tsvector) + GIN index, match by @@ and rank by ts_rank_cd.
+# [*] 'english' should stay same as the config used in the generated column expression (models.Post).
+
+SEARCH_CONFIG = 'english'
+
+
+def search_query(q: str):
+    # websearch syntax: quoted phrases, OR, -exclude. never raise on user input
+    return func.websearch_to_tsquery(SEARCH_CONFIG, q)
+
+
+def search_filters(q: str) -> list:
+    """
+    empty q match all posts (same as before with LIKE '%%').
+    """
+    if not q.strip():
+        return []
+    return [models.Post.search_vector.op('@@')(search_query(q))]
+
+
+def search_order(q: str) -> tuple:
+    """
+    best match first, newest first between equal ranks.
+    """
+    if not q.strip():
+        return NEWEST_FIRST
+    return (desc(func.ts_rank_cd(models.Post.search_vector, search_query(q))), *NEWEST_FIRST)
@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import uuid
+from pathlib import Path
+from typing import AsyncIterator
+from fastapi import HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .config import BLOB_SWEEP_INTERVAL_SECONDS, STAGING_DIR, UPLOAD_CHUNK_SIZE, UPLOAD_MAX_SIZE
+from .database import SessionLocal
+from .storage_backends import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Streaming Uploads
+# [*] never hold whole file in memory, copy it chunk by chunk (memory per upload = chunk size).
+# [*] disk IO run in thread pool, event loop free while writing.
+# [*] write into temp file in the same directory then rename, readers never see half written file.
+
+
+async def save_upload(upload: UploadFile, destination: Path) -> tuple[int, str]:
+    """
+    stream upload into destination, return (size in bytes, sha256 hex digest).
+    raise 413 when file exceed UPLOAD_MAX_SIZE (nothing left on disk).
+    """
+    return await save_stream(_iter_upload(upload), destination)
+
+
+async def _iter_upload(upload: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
+
+
+async def save_stream(chunks: AsyncIterator[bytes], destination: Path, max_size: int = UPLOAD_MAX_SIZE) -> tuple[int, str]:
+    """
+    same as save_upload, for any async chunks source (like raw request body).
+    """
+    temp = await run_in_threadpool(
+        tempfile.NamedTemporaryFile, dir=destination.parent, prefix='.upload-', delete=False
+    )
+    checksum = hashlib.sha256()
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if max_size and size > max_size:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"file larger than {max_size} bytes")
+            checksum.update(chunk)
+            await run_in_threadpool(temp.write, chunk)
+
+        await run_in_threadpool(_flush_and_close, temp)
+        await run_in_threadpool(os.replace, temp.name, destination) # atomic on same filesystem
+    except BaseException:
+        await run_in_threadpool(_discard, temp)
+        raise
+
+    return size, checksum.hexdigest()
+
+
+def _flush_and_close(temp) -> None:
+    temp.flush()
+    os.fsync(temp.fileno())
+    temp.close()
+
+
+def _discard(temp) -> None:
+    temp.close()
+    Path(temp.name).unlink(missing_ok=True)
+
+
+# Content-Addressed Store
+# [*] file stored once by its sha256 under key ab/cd/abcd..., two levels of 256 dirs keep each dir small at millions of files.
+# [*] upload hash the (already spooled) file first, if content exist nothing written, only new metadata row.
+# [*] blobs.ref_count = number of files rows pointing to the content, object removed when it reach 0.
+# [*] reference taken first (upsert RETURNING ref_count, row locked until commit), dedup decided from it not from storage:
+#     ref_count 1 -> this request created the blob and store the object before commit, others wait on the row lock.
+# [*] last reference release leave the blob row at ref_count 0 (committed with the files row delete), then sweep_blob
+#     lock it again, delete the object and the row in its own transaction. a new upload of same content wait on that lock,
+#     and upsert on a row left at 0 (sweep failed) give ref_count 1, so it store the object again.
+# [*] zero-ref blobs left behind (object delete / commit failed) swept periodically.
+# [*] objects live in the configured backend (local dir or S3), see storage_backends.
+
+
+def object_key(sha256: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+async def hash_upload(upload: UploadFile) -> tuple[int, str]:
+    """
+    read upload once to hash it, then rewind it. raise 413 when exceed UPLOAD_MAX_SIZE.
+    """
+    checksum = hashlib.sha256()
+    size = 0
+    async for chunk in _iter_upload(upload):
+        size += len(chunk)
+        if UPLOAD_MAX_SIZE and size > UPLOAD_MAX_SIZE:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"file larger than {UPLOAD_MAX_SIZE} bytes")
+        checksum.update(chunk)
+    await upload.seek(0)
+    return size, checksum.hexdigest()
+
+
+async def store_upload(db: AsyncSession, upload: UploadFile) -> tuple[int, str, bool]:
+    """
+    take a reference on the upload content and store it if new, return (size, sha256, deduplicated).
+    commit left to the caller (same transaction as files row).
+    """
+    size, sha256 = await hash_upload(upload)
+    if await acquire_blob(db, sha256, size) > 1:
+        return size, sha256, True
+
+    staging = STAGING_DIR / uuid.uuid4().hex
+    await save_upload(upload, staging)
+    await get_storage().put_file(object_key(sha256), staging)
+    return size, sha256, False
+
+
+def _hash_file(path: Path) -> tuple[int, str]:
+    checksum = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as file:
+        while chunk := file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            checksum.update(chunk)
+    return size, checksum.hexdigest()
+
+
+async def ingest_file(db: AsyncSession, path: Path) -> tuple[int, str, bool]:
+    """
+    move a complete local file (e.g. assembled multipart upload) into the store, return (size, sha256, deduplicated).
+    reference taken like store_upload, commit left to the caller.
+    """
+    size, sha256 = await run_in_threadpool(_hash_file, path)
+    if await acquire_blob(db, sha256, size) > 1:
+        await run_in_threadpool(path.unlink, True)
+        return size, sha256, True
+
+    await get_storage().put_file(object_key(sha256), path)
+    return size, sha256, False
+
+
+async def acquire_blob(db: AsyncSession, sha256: str, size: int) -> int:
+    """
+    +1 reference, create blob row on first reference, return new ref_count (1 = blob just created, or revived from 0: object to store).
+    blob row stay locked until caller commit.
+    """
+    stmt = insert(models.Blob).values(sha256=sha256, size=size, ref_count=1)
+    stmt = stmt.on_conflict_do_update(index_elements=[models.Blob.sha256], set_={"ref_count": models.Blob.ref_count + 1})
+    return await db.scalar(stmt.returning(models.Blob.ref_count))
+
+
+async def release_blob(db: AsyncSession, sha256: str) -> bool:
+    """
+    -1 reference, return True when no references left (row kept at 0, call sweep_blob after commit).
+    """
+    ref_count = await db.scalar(
+        update(models.Blob).where(models.Blob.sha256 == sha256).values(ref_count=models.Blob.ref_count - 1).returning(models.Blob.ref_count)
+    )
+    return ref_count is not None and ref_count <= 0
+
+
+async def sweep_blob(db: AsyncSession, sha256: str) -> bool:
+    """
+    remove object and row of an unreferenced blob, own transaction. return False when referenced again meanwhile.
+    """
+    locked = await db.scalar(
+        select(models.Blob.sha256).where(models.Blob.sha256 == sha256, models.Blob.ref_count <= 0).with_for_update()
+    )
+    if locked is None:
+        await db.rollback()
+        return False
+    await remove_object(sha256) # row locked: no upload can take a reference now
+    await db.execute(delete(models.Blob).where(models.Blob.sha256 == sha256))
+    await db.commit()
+    return True
+
+
+async def sweep_unreferenced(batch_size: int = 1000) -> int:
+    """
+    sweep zero-ref blobs left by failed deletes, return number of removed blobs.
+    """
+    removed = 0
+    async with SessionLocal() as db:
+        candidates = (await db.scalars(select(models.Blob.sha256).where(models.Blob.ref_count <= 0).limit(batch_size))).all()
+        await db.rollback()
+        for sha256 in candidates:
+            removed += await sweep_blob(db, sha256)
+    return removed
+
+
+async def run_periodic_sweep() -> None:
+    """
+    background task, started on app startup when BLOB_SWEEP_INTERVAL_SECONDS set.
+    """
+    while True:
+        await asyncio.sleep(BLOB_SWEEP_INTERVAL_SECONDS)
+        try:
+            removed = await sweep_unreferenced()
+            if removed:
+                logger.info("removed %d unreferenced blobs", removed)
+        except Exception:
+            logger.exception("unreferenced blobs sweep failed")
+
+
+async def remove_object(sha256: str) -> None:
+    await get_storage().delete(object_key(sha256))
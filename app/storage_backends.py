@@ -0,0 +1,188 @@
+import asyncio
+import os
+from contextlib import AsyncExitStack
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import AsyncIterator
+from fastapi.concurrency import run_in_threadpool
+
+from .config import (
+    OBJECTS_DIR, STORAGE_BACKEND, UPLOAD_CHUNK_SIZE,
+    S3_BUCKET, S3_ENDPOINT_URL, S3_REGION, S3_ACCESS_KEY_ID, S3_SECRET_ACCESS_KEY,
+    S3_PRESIGN_EXPIRE_SECONDS, S3_MULTIPART_CHUNK_SIZE, S3_MAX_CONCURRENCY,
+)
+
+# Storage Backends
+# [*] where content-addressed objects live, selected by STORAGE_BACKEND.
+# [*] local: directory on this node (single node only).
+# [*] s3: shared by all replicas, downloads redirected to presigned url so bytes never pass through app workers.
+# [*] files always prepared in local staging first (hash known before store), then put_file move/upload them.
+
+
+class StorageBackend(ABC):
+
+    @abstractmethod
+    async def put_file(self, key: str, path: Path) -> None:
+        """
+        store local file under key, the local file consumed (moved or deleted).
+        """
+
+    @abstractmethod
+    def get_stream(self, key: str, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        """
+        content bytes [start, end] (inclusive), whole object by default.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    async def presigned_url(self, key: str, filename: str, cache_control: str | None = None) -> str | None:
+        """
+        direct download url, None when backend can't serve downloads by itself.
+        cache_control: Cache-Control header the download response should carry.
+        """
+        return None
+
+    async def open(self) -> None:
+        """
+        app startup, create long-lived resources (connections) if any.
+        """
+
+    async def close(self) -> None:
+        """
+        app shutdown, release what open created.
+        """
+
+
+class LocalStorage(StorageBackend):
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    async def put_file(self, key: str, path: Path) -> None:
+        await run_in_threadpool(self._move, path, self.path(key))
+
+    @staticmethod
+    def _move(path: Path, target: Path) -> None:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(path, target) # same filesystem, no copy
+
+    async def get_stream(self, key: str, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        file = await run_in_threadpool(open, self.path(key), 'rb')
+        try:
+            await run_in_threadpool(file.seek, start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = UPLOAD_CHUNK_SIZE if remaining is None else min(UPLOAD_CHUNK_SIZE, remaining)
+                chunk = await run_in_threadpool(file.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            await run_in_threadpool(file.close)
+
+    async def delete(self, key: str) -> None:
+        await run_in_threadpool(self.path(key).unlink, True)
+
+
+class S3Storage(StorageBackend):
+    """
+    needs aioboto3 (`pip install aioboto3`), only imported when this backend is selected.
+    """
+
+    def __init__(self, bucket: str):
+        try:
+            import aioboto3
+            from boto3.s3.transfer import TransferConfig
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND='s3' requires aioboto3, install it with `pip install aioboto3`") from e
+
+        self.bucket = bucket
+        self.session = aioboto3.Session(
+            aws_access_key_id=S3_ACCESS_KEY_ID,
+            aws_secret_access_key=S3_SECRET_ACCESS_KEY,
+            region_name=S3_REGION,
+        )
+        # big files uploaded as multipart, parts sent concurrently
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=S3_MULTIPART_CHUNK_SIZE,
+            max_concurrency=S3_MAX_CONCURRENCY,
+        )
+
+        # one client (and its connection pool) for the worker lifetime, not one per call
+        self._stack: AsyncExitStack | None = None
+        self._s3 = None
+        self._lock = asyncio.Lock()
+
+    async def open(self) -> None:
+        async with self._lock:
+            if self._s3 is None:
+                self._stack = AsyncExitStack()
+                self._s3 = await self._stack.enter_async_context(self.session.client('s3', endpoint_url=S3_ENDPOINT_URL))
+
+    async def close(self) -> None:
+        async with self._lock:
+            if self._stack is not None:
+                await self._stack.aclose()
+            self._stack, self._s3 = None, None
+
+    async def _client(self):
+        if self._s3 is None:
+            await self.open() # used outside app lifetime (scripts), opened on first call
+        return self._s3
+
+    async def put_file(self, key: str, path: Path) -> None:
+        try:
+            s3 = await self._client()
+            await s3.upload_file(str(path), self.bucket, key, Config=self.transfer_config)
+        finally:
+            await run_in_threadpool(path.unlink, True)
+
+    async def get_stream(self, key: str, start: int = 0, end: int | None = None) -> AsyncIterator[bytes]:
+        extra = {}
+        if start or end is not None:
+            extra["Range"] = f"bytes={start}-{'' if end is None else end}"
+        s3 = await self._client()
+        response = await s3.get_object(Bucket=self.bucket, Key=key, **extra)
+        async with response['Body'] as body:
+            while chunk := await body.read(UPLOAD_CHUNK_SIZE):
+                yield chunk
+
+    async def delete(self, key: str) -> None:
+        s3 = await self._client()
+        await s3.delete_object(Bucket=self.bucket, Key=key)
+
+    async def presigned_url(self, key: str, filename: str, cache_control: str | None = None) -> str | None:
+        s3 = await self._client()
+        params = {
+            "Bucket": self.bucket,
+            "Key": key,
+            "ResponseContentDisposition": f"attachment; filename={filename}",
+            "ResponseContentType": "application/octet-stream",
+        }
+        if cache_control:
+            params["ResponseCacheControl"] = cache_control # per file policy kept on direct downloads
+        return await s3.generate_presigned_url(
+            'get_object',
+            Params=params,
+            ExpiresIn=S3_PRESIGN_EXPIRE_SECONDS,
+        )
+
+
+_backend: StorageBackend | None = None
+
+
+def get_storage() -> StorageBackend:
+    global _backend
+    if _backend is None:
+        if STORAGE_BACKEND == 's3':
+            _backend = S3Storage(S3_BUCKET)
+        else:
+            _backend = LocalStorage(OBJECTS_DIR)
+    return _backend
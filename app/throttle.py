@@ -0,0 +1,97 @@
+import asyncio
+import time
+import uuid
+from fastapi import HTTPException, status
+from redis.asyncio import Redis
+
+from .config import (
+    LOGIN_WINDOW_SECONDS, LOGIN_FREE_ATTEMPTS, LOGIN_MAX_DELAY_SECONDS,
+    LOGIN_MAX_FAILURES_PER_CLIENT, LOGIN_MAX_FAILURES_PER_IP, LOGIN_MAX_FAILURES_PER_ACCOUNT,
+)
+
+# Brute-Force Throttle
+# [*] login attempts stored in sorted sets (score = timestamp), one per (account, ip), one per account and one per ip.
+# [*] attempt recorded BEFORE checking the password, counted and added in one script (atomic):
+#     a parallel burst of guesses can't all read 0 failures and pass together.
+# [*] successful login remove its attempt again (and clear the client failures), so only failures stay counted.
+# [*] backoff delay keyed on (account, ip): only the offending client wait, the real owner on other ip not slowed.
+# [*] hard block (429) on (account, ip), on ip, and on account with a much higher threshold (distributed guessing).
+# [*] count of a sliding window = ZREMRANGEBYSCORE old entries + ZCARD.
+
+
+def _account_key(email: str) -> str:
+    return f"login_failures:account:{email.lower()}"
+
+
+def _client_key(email: str, ip: str) -> str:
+    return f"login_failures:client:{email.lower()}:{ip}"
+
+
+def _ip_key(ip: str) -> str:
+    return f"login_failures:ip:{ip}"
+
+
+# KEYS: client, account, ip / ARGV: now, window start, attempt id, window seconds, limit of each key
+# return -1 when one of the keys reached its limit (attempt not recorded), else client failures before this attempt.
+_ATTEMPT_LUA = """
+local counts = {}
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, 0, ARGV[2])
+    counts[i] = redis.call('ZCARD', key)
+    if counts[i] >= tonumber(ARGV[4 + i]) then return -1 end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, ARGV[1], ARGV[3])
+    redis.call('EXPIRE', key, ARGV[4])
+end
+return counts[1]
+"""
+
+
+def backoff_delay(failures: int) -> float:
+    """
+    exponential delay (0.5, 1, 2, 4 ...) once failures exceed the free attempts, capped.
+    """
+    over = failures - LOGIN_FREE_ATTEMPTS
+    if over < 0:
+        return 0
+    return min(LOGIN_MAX_DELAY_SECONDS, 0.5 * 2 ** over)
+
+
+async def begin_login(redis_cli: Redis, email: str, ip: str) -> str:
+    """
+    call before checking credentials: record the attempt as failed, raise 429 if client is blocked
+    else wait its backoff delay. return attempt id, given back to login_succeeded.
+    """
+    now = time.time()
+    attempt = f"{now}:{uuid.uuid4().hex}"
+    script = redis_cli.register_script(_ATTEMPT_LUA)
+    client_failures = await script(
+        keys=[_client_key(email, ip), _account_key(email), _ip_key(ip)],
+        args=[now, now - LOGIN_WINDOW_SECONDS, attempt, LOGIN_WINDOW_SECONDS,
+              LOGIN_MAX_FAILURES_PER_CLIENT, LOGIN_MAX_FAILURES_PER_ACCOUNT, LOGIN_MAX_FAILURES_PER_IP],
+    )
+
+    if client_failures < 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, try again later",
+            headers={"Retry-After": str(LOGIN_WINDOW_SECONDS)},
+        )
+
+    delay = backoff_delay(client_failures)
+    if delay:
+        await asyncio.sleep(delay)
+    return attempt
+
+
+async def login_succeeded(redis_cli: Redis, email: str, ip: str, attempt: str) -> None:
+    """
+    credentials valid: attempt not a failure, client failures cleared
+    (account and ip failures of other clients kept).
+    """
+    async with redis_cli.pipeline(transaction=False) as pipeline:
+        pipeline.delete(_client_key(email, ip))
+        pipeline.zrem(_account_key(email), attempt)
+        pipeline.zrem(_ip_key(ip), attempt)
+        await pipeline.execute()
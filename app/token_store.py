@@ -0,0 +1,168 @@
+import hashlib
+import time
+from datetime import timedelta
+from redis.asyncio import ConnectionPool, Redis
+
+from .config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS,
+    REDIS_HOSTNAME, REDIS_PASSWORD, REDIS_PORT,
+    REDIS_MAX_CONNECTIONS, REDIS_SOCKET_TIMEOUT, REDIS_SOCKET_CONNECT_TIMEOUT, REDIS_HEALTH_CHECK_INTERVAL,
+)
+
+# [*] One pool per worker process, every request borrow connection from it then give it back.
+# [*] Connections are opened lazily, so creating the pool here not touch the network.
+pool = ConnectionPool(
+    host=REDIS_HOSTNAME,
+    port=REDIS_PORT,
+    password=REDIS_PASSWORD,
+    decode_responses=True,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+)
+
+
+def get_redis() -> Redis:
+    """
+    dependency, return client bound to the shared pool (cheap, no connection opened here).
+    """
+    return Redis(connection_pool=pool)
+
+
+async def close_pool() -> None:
+    await pool.disconnect()
+
+
+# Token Registry
+# [*] token:{sha256(token)} -> user id (with token TTL), validate token by single EXISTS
+# [*] user_tokens:{id} -> sorted set of token hashes issued for the user, scored by token expiry time
+# [*] expired hashes trimmed (ZREMRANGEBYSCORE) on every register, set not grow with every login of an active user
+# [*] revoke all by ZRANGEBYSCORE (live tokens only) + pipelined DEL
+# [*] no KEYS/SCAN on the request path anymore, cost not grow with number of live tokens
+
+ACCESS_TOKEN_TTL = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+REFRESH_TOKEN_TTL = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _token_key(hashed: str) -> str:
+    return f"token:{hashed}"
+
+
+def _user_tokens_key(id) -> str:
+    return f"user_tokens:{id}"
+
+
+def _register(pipeline, id, token: str, ttl: timedelta) -> None:
+    hashed = token_hash(token)
+    now = time.time()
+    pipeline.setex(name=_token_key(hashed), value=str(id), time=ttl)
+    pipeline.zremrangebyscore(_user_tokens_key(id), '-inf', now)
+    pipeline.zadd(_user_tokens_key(id), {hashed: now + ttl.total_seconds()})
+    # set live at least as long as longest token inside it
+    pipeline.expire(_user_tokens_key(id), REFRESH_TOKEN_TTL)
+
+
+async def store_tokens(redis_cli: Redis, id, access_token: str, refresh_token: str) -> None:
+    async with redis_cli.pipeline(transaction=False) as pipeline:
+        _register(pipeline, id, access_token, ACCESS_TOKEN_TTL)
+        _register(pipeline, id, refresh_token, REFRESH_TOKEN_TTL)
+        await pipeline.execute()
+
+
+async def store_access_token(redis_cli: Redis, id, token: str) -> None:
+    async with redis_cli.pipeline(transaction=False) as pipeline:
+        _register(pipeline, id, token, ACCESS_TOKEN_TTL)
+        await pipeline.execute()
+
+
+async def store_refresh_token(redis_cli: Redis, id, token: str) -> None:
+    async with redis_cli.pipeline(transaction=False) as pipeline:
+        _register(pipeline, id, token, REFRESH_TOKEN_TTL)
+        await pipeline.execute()
+
+
+async def token_exists(redis_cli: Redis, token: str, id=None) -> bool:
+    """
+    Check if token (access or refresh) exists in Redis.
+    pass the user id (from token payload) to also accept tokens issued before the registry, they moved into it on first use.
+    """
+    if await redis_cli.exists(_token_key(token_hash(token))):
+        return True
+
+    if id is None:
+        return False
+
+    return await _migrate_legacy_token(redis_cli, id, token)
+
+
+async def revoke_user_tokens(redis_cli: Redis, id) -> None:
+    """
+    delete all tokens issued for the user, legacy ones included (else migrated back on next use).
+    """
+    # legacy first: a migration already in flight land in the registry before it is read below.
+    # only while legacy tokens can still exist (migration window), SCAN cost grow with the keyspace
+    legacy_names = [name async for name in redis_cli.scan_iter(match=f"{id}:*_token:*", count=1000)]
+    if legacy_names:
+        await redis_cli.delete(*legacy_names)
+
+    hashes = await redis_cli.zrangebyscore(_user_tokens_key(id), time.time(), '+inf') # expired ones already gone
+    # In Redis, a pipeline is a feature that allows you to send multiple commands to the server without waiting for the replies of each command, thus reducing the latency of round trips.
+    async with redis_cli.pipeline(transaction=False) as pipeline:
+        for hashed in hashes:
+            pipeline.delete(_token_key(hashed))
+        pipeline.delete(_user_tokens_key(id))
+        await pipeline.execute()
+
+
+# Legacy Tokens Migration
+# [*] before the registry tokens stored as {id}:access_token:{token} / {id}:refresh_token:{token}
+# [*] lazy path: token_exists move legacy token into registry on first use (O(1), id known from payload)
+# [*] bulk path: `python -m app.token_store` move all of them once (SCAN, run it offline not per request)
+
+async def _migrate_legacy_token(redis_cli: Redis, id, token: str) -> bool:
+    for kind in ('access_token', 'refresh_token'):
+        legacy_name = f"{id}:{kind}:{token}"
+        ttl = await redis_cli.pttl(legacy_name)
+        if ttl > 0:
+            await _move_legacy_token(redis_cli, legacy_name, id, token, ttl)
+            return True
+    return False
+
+
+async def _move_legacy_token(redis_cli: Redis, legacy_name: str, id, token: str, ttl_ms: int) -> None:
+    async with redis_cli.pipeline(transaction=False) as pipeline:
+        _register(pipeline, id, token, timedelta(milliseconds=ttl_ms))
+        pipeline.delete(legacy_name)
+        await pipeline.execute()
+
+
+async def migrate_legacy_tokens(redis_cli: Redis, batch_size: int = 1000) -> int:
+    """
+    move all legacy token keys into the registry, keep remaining TTL. return number of moved tokens.
+    """
+    moved = 0
+    for kind in ('access_token', 'refresh_token'):
+        async for legacy_name in redis_cli.scan_iter(match=f"*:{kind}:*", count=batch_size):
+            id, _, token = legacy_name.split(':', 2)
+            ttl = await redis_cli.pttl(legacy_name)
+            if ttl <= 0: # expired meanwhile or has no TTL
+                continue
+            await _move_legacy_token(redis_cli, legacy_name, id, token, ttl)
+            moved += 1
+    return moved
+
+
+if __name__ == '__main__':
+    import asyncio
+
+    async def main():
+        moved = await migrate_legacy_tokens(get_redis())
+        print(f'migrated {moved} legacy tokens')
+        await close_pool()
+
+    asyncio.run(main())
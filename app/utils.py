@@ -1,15 +1,76 @@
 
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Dict, Tuple
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+from .config import PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE
+
 pwd_context: CryptContext = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 # Hashing Password Dealears
+# [*] bcrypt is CPU heavy (~100-300 ms), running it on event loop freeze every other request of the worker.
+# [*] so async versions run it in bounded pool (bcrypt release the GIL, threads scale with cores).
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password,hashed_password)
+
+
+_executor: Executor | None = None
+_in_flight: int = 0 # submitted jobs, running + waiting
+_rejected: int = 0
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if PASSWORD_HASH_EXECUTOR == 'process':
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+    return _executor
+
+
+async def _run_in_pool(fn, *args):
+    global _in_flight, _rejected
+    if _in_flight >= PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE:
+        _rejected += 1
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server busy, try again later", headers={"Retry-After": "1"})
+
+    _in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _in_flight -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run_in_pool(get_password_hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_pool(verify_password_sync, plain_password, hashed_password)
+
+
+def hashing_stats() -> Dict[str, int | str]:
+    return {
+        "executor": PASSWORD_HASH_EXECUTOR,
+        "workers": PASSWORD_HASH_WORKERS,
+        "in_flight": _in_flight,
+        "queue_depth": max(0, _in_flight - PASSWORD_HASH_WORKERS),
+        "max_queue": PASSWORD_HASH_MAX_QUEUE,
+        "rejected": _rejected,
+    }
+
+
+def shutdown_hashing_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
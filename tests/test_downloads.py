@@ -0,0 +1,43 @@
+import pytest
+from fastapi import HTTPException
+
+from app.downloads import parse_range
+
+SIZE = 10
+
+
+def test_open_range_at_end_of_file_not_satisfiable():
+    # resume of an already complete download
+    with pytest.raises(HTTPException) as error:
+        parse_range(f'bytes={SIZE}-', SIZE)
+    assert error.value.status_code == 416
+    assert error.value.headers["Content-Range"] == f"bytes */{SIZE}"
+
+
+def test_open_range_past_end_of_file_not_satisfiable():
+    with pytest.raises(HTTPException) as error:
+        parse_range(f'bytes={SIZE + 10}-', SIZE)
+    assert error.value.status_code == 416
+
+
+def test_range_past_end_dropped_when_others_satisfiable():
+    assert parse_range(f'bytes=0-1, {SIZE}-', SIZE) == [(0, 1)]
+
+
+def test_reversed_range_ignored():
+    # malformed, whole file served
+    assert parse_range('bytes=5-2', SIZE) is None
+
+
+def test_open_range():
+    assert parse_range('bytes=4-', SIZE) == [(4, SIZE - 1)]
+
+
+def test_end_clamped_to_size():
+    assert parse_range('bytes=4-100', SIZE) == [(4, SIZE - 1)]
+
+
+def test_suffix_range_on_empty_file_not_satisfiable():
+    with pytest.raises(HTTPException) as error:
+        parse_range('bytes=-5', 0)
+    assert error.value.status_code == 416
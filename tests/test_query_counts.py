@@ -0,0 +1,116 @@
+"""
+SQL statements budget of post listing endpoints, fail when a change add queries per row (N+1).
+run against the configured (migrated) postgres and redis, like the app itself:
+
+    python -m pytest tests/test_query_counts.py
+
+rows created for the run are deleted after it, response cache bypassed so every request reach postgres.
+"""
+import asyncio
+import uuid
+import httpx
+import pytest
+from sqlalchemy import delete
+from sqlalchemy.exc import OperationalError
+
+from app import models, response_cache
+from app.database import SessionLocal, engine
+from app.main import app
+from app.query_counter import assert_max_statements
+from app.routers.auth_utils import get_user_from_token
+
+AUTHORS = 3
+POSTS_PER_AUTHOR = 8 # more rows than one page, statements must not grow with page size
+
+
+@pytest.fixture(scope='module')
+def loop():
+    # one loop for the module, pooled connections are bound to it
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.run_until_complete(engine.dispose())
+    loop.close()
+
+
+async def _seed() -> tuple[models.User, list[int]]:
+    tag = uuid.uuid4().hex[:8]
+    async with SessionLocal() as db:
+        users = [models.User(email=f"query-count-{tag}-{i}@example.com", password='not used') for i in range(AUTHORS)]
+        db.add_all(users)
+        await db.flush()
+        db.add_all(
+            models.Post(title=f"query count post {i}", content=f"written by {user.email}", published=True, user_id=user.id)
+            for user in users for i in range(POSTS_PER_AUTHOR)
+        )
+        # first user follow the others, its feed pulled from postgres (nothing pushed in redis for it)
+        db.add_all(models.Follow(follower_id=users[0].id, followed_id=user.id) for user in users[1:])
+        await db.commit()
+        return users[0], [user.id for user in users]
+
+
+async def _cleanup(user_ids: list[int]) -> None:
+    async with SessionLocal() as db:
+        await db.execute(delete(models.User).where(models.User.id.in_(user_ids))) # posts and follows cascade
+        await db.commit()
+
+
+@pytest.fixture(scope='module')
+def viewer(loop):
+    try:
+        user, user_ids = loop.run_until_complete(_seed())
+    except (OSError, OperationalError) as e:
+        pytest.skip(f"database not reachable: {e}")
+
+    app.dependency_overrides[get_user_from_token] = lambda: user
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(response_cache, 'RESPONSE_CACHE_TTL_SECONDS', 0)
+        yield user
+    app.dependency_overrides.pop(get_user_from_token, None)
+    loop.run_until_complete(_cleanup(user_ids))
+
+
+def get(loop, url: str, max_statements: int) -> httpx.Response:
+    """
+    request through the ASGI app in this task, so the statements counter see the handler queries.
+    """
+    async def request() -> httpx.Response:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+            with assert_max_statements(max_statements):
+                return await client.get(url)
+
+    response = loop.run_until_complete(request())
+    assert response.status_code == 200, response.text
+    return response
+
+
+@pytest.mark.parametrize('per_page', [1, 10])
+def test_time_line(loop, viewer, per_page):
+    get(loop, f'/posts/time-line?per_page={per_page}&count_strategy=none', 1)
+    get(loop, f'/posts/time-line?per_page={per_page}&count_strategy=exact', 2) # + COUNT
+
+
+def test_time_line_cursor(loop, viewer):
+    first = get(loop, '/posts/time-line?per_page=5&use_cursor=true', 1).json()
+    get(loop, f"/posts/time-line?per_page=5&cursor={first['next_cursor']}", 1)
+
+
+@pytest.mark.parametrize('per_page', [1, 10])
+def test_search(loop, viewer, per_page):
+    get(loop, f'/posts?q=query&per_page={per_page}&count_strategy=none', 1)
+
+
+@pytest.mark.parametrize('per_page', [1, 10])
+def test_me(loop, viewer, per_page):
+    get(loop, f'/posts/me?per_page={per_page}&count_strategy=none', 1)
+    get(loop, f'/posts/me?per_page={per_page}&use_cursor=true', 1)
+
+
+@pytest.mark.parametrize('per_page', [1, 10])
+def test_feed(loop, viewer, per_page):
+    page = get(loop, f'/posts/feed?per_page={per_page}', 2).json() # pull + hydrate
+    assert len(page['result']) == per_page
+
+
+def test_get_post(loop, viewer):
+    post_id = get(loop, '/posts/me?per_page=1&count_strategy=none', 1).json()['result'][0]['post']['id']
+    get(loop, f'/posts/{post_id}', 1)
@@ -0,0 +1,81 @@
+"""
+S3Storage against an in-process moto S3 server (needs aioboto3 and moto[server], skipped otherwise).
+"""
+import asyncio
+from urllib.parse import parse_qs, urlparse
+import httpx
+import pytest
+
+pytest.importorskip('aioboto3')
+moto_server = pytest.importorskip('moto.server')
+
+from app import storage_backends
+from app.storage_backends import S3Storage
+
+BUCKET = 'test-objects'
+
+
+@pytest.fixture(scope='module')
+def endpoint():
+    server = moto_server.ThreadedMotoServer(ip_address='127.0.0.1', port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    yield f"http://{host}:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def s3_storage(endpoint, monkeypatch):
+    monkeypatch.setattr(storage_backends, 'S3_ENDPOINT_URL', endpoint)
+    monkeypatch.setattr(storage_backends, 'S3_REGION', 'us-east-1')
+    monkeypatch.setattr(storage_backends, 'S3_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setattr(storage_backends, 'S3_SECRET_ACCESS_KEY', 'testing')
+    return S3Storage(BUCKET)
+
+
+def run(storage: S3Storage, scenario):
+    async def with_client():
+        await storage.open()
+        try:
+            s3 = await storage._client()
+            await s3.create_bucket(Bucket=BUCKET)
+            await scenario(s3)
+        finally:
+            await storage.close()
+
+    asyncio.run(with_client())
+
+
+def test_put_presign_delete(s3_storage, tmp_path):
+    source = tmp_path / 'content'
+    source.write_bytes(b'hello object')
+
+    async def scenario(s3):
+        await s3_storage.put_file('ab/cd/abcd', source)
+        assert not source.exists() # local file consumed
+
+        chunks = [chunk async for chunk in s3_storage.get_stream('ab/cd/abcd', 6)]
+        assert b''.join(chunks) == b'object'
+
+        url = await s3_storage.presigned_url('ab/cd/abcd', 'greeting.txt', 'private, max-age=60')
+        query = parse_qs(urlparse(url).query)
+        assert query['response-cache-control'] == ['private, max-age=60']
+        assert query['response-content-disposition'] == ['attachment; filename=greeting.txt']
+        async with httpx.AsyncClient() as client:
+            response = await client.get(url)
+        assert response.status_code == 200
+        assert response.content == b'hello object'
+
+        await s3_storage.delete('ab/cd/abcd')
+        listed = await s3.list_objects_v2(Bucket=BUCKET)
+        assert listed.get('KeyCount', 0) == 0
+
+    run(s3_storage, scenario)
+
+
+def test_presign_without_cache_control(s3_storage):
+    async def scenario(s3):
+        url = await s3_storage.presigned_url('ab/cd/abcd', 'greeting.txt')
+        assert 'response-cache-control' not in parse_qs(urlparse(url).query)
+
+    run(s3_storage, scenario)
@@ -0,0 +1,58 @@
+"""
+token registry against the configured redis (skipped when not reachable).
+"""
+import asyncio
+import random
+import pytest
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError
+
+from app.config import REDIS_HOSTNAME, REDIS_PASSWORD, REDIS_PORT
+from app.token_store import revoke_user_tokens, store_tokens, token_exists
+
+
+def run(scenario):
+    async def with_client():
+        redis_cli = Redis(host=REDIS_HOSTNAME, port=REDIS_PORT, password=REDIS_PASSWORD, decode_responses=True)
+        try:
+            await redis_cli.ping()
+        except (ConnectionError, OSError) as e:
+            pytest.skip(f"redis not reachable: {e}")
+        try:
+            await scenario(redis_cli)
+        finally:
+            await redis_cli.aclose()
+
+    asyncio.run(with_client())
+
+
+def test_revoke_removes_registry_tokens():
+    user_id = random.randint(10**9, 2 * 10**9)
+
+    async def scenario(redis_cli: Redis):
+        await store_tokens(redis_cli, user_id, 'access-token', 'refresh-token')
+        assert await token_exists(redis_cli, 'access-token', user_id)
+
+        await revoke_user_tokens(redis_cli, user_id)
+        assert not await token_exists(redis_cli, 'access-token', user_id)
+        assert not await token_exists(redis_cli, 'refresh-token', user_id)
+
+    run(scenario)
+
+
+def test_revoke_removes_legacy_tokens():
+    # token issued before the registry, never used since (not migrated yet)
+    user_id = random.randint(10**9, 2 * 10**9)
+
+    async def scenario(redis_cli: Redis):
+        await redis_cli.setex(f"{user_id}:access_token:legacy-token", 600, 'legacy')
+        await redis_cli.setex(f"{user_id}:refresh_token:legacy-refresh", 600, 'legacy')
+
+        await revoke_user_tokens(redis_cli, user_id)
+
+        # not migrated back into the registry on next use
+        assert not await token_exists(redis_cli, 'legacy-token', user_id)
+        assert not await token_exists(redis_cli, 'legacy-refresh', user_id)
+        assert not await redis_cli.exists(f"{user_id}:access_token:legacy-token", f"{user_id}:refresh_token:legacy-refresh")
+
+    run(scenario)